@@ -0,0 +1,232 @@
+"""
+🏁 CORREDOR DE SIMULACIONES - Juego de Carreras Retro
+Reparte carreras sin ventana entre todos los núcleos de la máquina.
+
+Cada semilla del rango es una carrera. Las semillas se agrupan en bloques
+que se envían a un pool de procesos, y los resultados se escriben en un
+archivo JSONL (una carrera por línea) a medida que termina cada bloque.
+Si se interrumpe, volver a correr el mismo comando retoma desde las
+semillas que faltan. Cada línea guarda una clave de configuración (tabla
+de niveles, límite de frames y motor): un barrido con otra configuración
+no reutiliza los resultados de otro.
+
+Uso:
+    python batch_runner.py --seeds 0:100000 --policy dodge --output resultados.jsonl
+    python batch_runner.py --seeds 0:5000 --levels niveles.json --workers 4
+"""
+
+# ============================================
+# IMPORTACIONES
+# ============================================
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bots import POLICIES, make_policy
+from event_simulation import run_race_events
+from simulation import LEVELS, TICK_RATE, run_race
+
+
+# Límite por defecto: una hora de juego por carrera
+DEFAULT_MAX_FRAMES = 60 * 60 * TICK_RATE
+
+
+# ============================================
+# TRABAJO DE CADA PROCESO
+# ============================================
+
+def get_config_key(levels, max_frames, engine):
+    """Clave corta que identifica la tabla de niveles, el límite de frames y el motor"""
+    config = json.dumps({'levels': levels, 'max_frames': max_frames, 'engine': engine},
+                        sort_keys=True)
+    return hashlib.sha1(config.encode('utf-8')).hexdigest()[:12]
+
+
+def run_chunk(seeds, policy_name, levels, max_frames, engine):
+    """
+    Corre un bloque de carreras en el proceso actual
+
+    Args:
+        seeds: Semillas de las carreras del bloque
+        policy_name: Nombre de la política en bots.POLICIES
+        levels: Tabla de niveles con el formato de LEVELS
+        max_frames: Límite de frames por carrera
+        engine: 'events' (salta frames sin cambios) o 'frames'
+
+    Returns:
+        Lista de resultados, uno por semilla
+    """
+    results = []
+    config = get_config_key(levels, max_frames, engine)
+
+    for seed in seeds:
+        policy = make_policy(policy_name, seed)
+        if engine == 'events':
+            result = run_race_events(policy=policy, max_frames=max_frames,
+                                     seed=seed, levels=levels)
+        else:
+            result = run_race(policy, max_frames=max_frames, seed=seed, levels=levels)
+
+        result['seed'] = seed
+        result['policy'] = policy_name
+        result['config'] = config
+        results.append(result)
+
+    return results
+
+
+# ============================================
+# ARCHIVO DE RESULTADOS
+# ============================================
+
+def load_done_seeds(path, policy_name, config):
+    """Obtiene las semillas ya guardadas en el archivo para esta política y configuración"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # Línea cortada por una interrupción
+            if not isinstance(result, dict):
+                continue
+            if result.get('policy') == policy_name and result.get('config') == config:
+                done.add(result['seed'])
+
+    return done
+
+
+def trim_partial_line(path):
+    """
+    Corta el archivo después de su último salto de línea
+
+    Una interrupción a mitad de escritura deja un resto sin '\\n' al final;
+    si no se corta, el próximo bloque se pegaría a esa línea y también se
+    perdería.
+    """
+    if not os.path.exists(path):
+        return
+
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+
+        if position != end:
+            f.truncate(position)
+
+
+def load_levels(path):
+    """Carga una tabla de niveles desde un archivo JSON"""
+    if path is None:
+        return LEVELS
+
+    with open(path, 'r') as f:
+        levels = json.load(f)
+
+    for level in levels:
+        missing = {'enemy_frequency', 'max_enemies', 'min_score'} - set(level)
+        if missing:
+            raise ValueError(f"Nivel sin {', '.join(sorted(missing))} en {path}")
+    return levels
+
+
+def parse_seed_range(text):
+    """Convierte 'inicio:fin' (fin excluido) en un range"""
+    try:
+        start, end = (int(part) for part in text.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Rango inválido: {text} (usar inicio:fin)")
+    return range(start, end)
+
+
+# ============================================
+# PUNTO DE ENTRADA
+# ============================================
+
+def run_batch(seeds, policy_name, levels, output, workers=None, chunk_size=100,
+              max_frames=DEFAULT_MAX_FRAMES, engine='events'):
+    """
+    Corre todas las semillas pendientes y agrega los resultados al archivo
+
+    Returns:
+        Cantidad de carreras corridas en esta llamada
+    """
+    config = get_config_key(levels, max_frames, engine)
+    trim_partial_line(output)
+    done = load_done_seeds(output, policy_name, config)
+    pending = [seed for seed in seeds if seed not in done]
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+
+    print(f"🏁 {len(pending)} carreras pendientes ({len(done)} ya guardadas) "
+          f"en {len(chunks)} bloques")
+
+    started = time.perf_counter()
+    completed = 0
+
+    with open(output, 'a') as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_chunk, chunk, policy_name, levels, max_frames, engine)
+                   for chunk in chunks]
+
+        for future in as_completed(futures):
+            results = future.result()
+
+            # Un bloque completo por escritura para poder retomar sin duplicados
+            f.write(''.join(json.dumps(result) + '\n' for result in results))
+            f.flush()
+
+            completed += len(results)
+            elapsed = time.perf_counter() - started
+            print(f"   {completed}/{len(pending)} carreras "
+                  f"({completed / elapsed:.0f} carreras/s)")
+
+    return completed
+
+
+def main(argv=None):
+    """Lee los argumentos de la línea de comandos y corre el lote"""
+    parser = argparse.ArgumentParser(description="Corre carreras sin ventana en paralelo")
+    parser.add_argument('--seeds', type=parse_seed_range, required=True,
+                        help="Rango de semillas inicio:fin (fin excluido)")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='dodge',
+                        help="Bot que conduce cada carrera")
+    parser.add_argument('--levels', default=None,
+                        help="Archivo JSON con la tabla de niveles (por defecto LEVELS)")
+    parser.add_argument('--output', default='resultados.jsonl',
+                        help="Archivo JSONL de resultados (se agrega y se retoma)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Procesos del pool (por defecto todos los núcleos)")
+    parser.add_argument('--chunk-size', type=int, default=100,
+                        help="Carreras por bloque enviado a cada proceso")
+    parser.add_argument('--max-frames', type=int, default=DEFAULT_MAX_FRAMES,
+                        help="Límite de frames por carrera")
+    parser.add_argument('--engine', choices=('events', 'frames'), default='events',
+                        help="Simulación por eventos o frame por frame")
+    args = parser.parse_args(argv)
+
+    try:
+        run_batch(args.seeds, args.policy, load_levels(args.levels), args.output,
+                  workers=args.workers, chunk_size=args.chunk_size,
+                  max_frames=args.max_frames, engine=args.engine)
+    except KeyboardInterrupt:
+        print("\n⚠️ Interrumpido: vuelve a correr el mismo comando para continuar")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+🏁 SIMULACIÓN POR LOTES - Juego de Carreras Retro
+Avanza miles de carreras independientes a la vez con arreglos de NumPy.
+
+Aplica las mismas reglas que simulation.Race, pero cada frame cuesta unas
+pocas operaciones sobre arreglos en lugar de una llamada por carrera.
+Pensado para ajustar LEVELS y SPEED_UP_EVERY con Monte Carlo.
+
+Requiere NumPy (pip install numpy). El juego no lo necesita.
+
+Uso básico:
+    batch = BatchRace(10000, seed=1)
+    batch.run(max_frames=20000)
+    print(batch.get_results()['score'].mean())
+"""
+
+# ============================================
+# IMPORTACIONES
+# ============================================
+import numpy as np
+
+from simulation import (
+    CANVAS_WIDTH, CANVAS_HEIGHT, PLAYER_WIDTH, PLAYER_HEIGHT,
+    ENEMY_WIDTH, ENEMY_HEIGHT, LANES, BASE_SPEED, SPEED_INCREMENT,
+    POINTS_PER_CAR, SPEED_UP_EVERY, LEVELS
+)
+
+
+# Acciones por carrera: -1 izquierda, 0 quieto, 1 derecha
+ACTION_LEFT = -1
+ACTION_NONE = 0
+ACTION_RIGHT = 1
+
+
+# ============================================
+# CLASE BATCHRACE
+# ============================================
+
+class BatchRace:
+    """
+    N carreras independientes avanzando en paralelo.
+
+    El estado de cada carrera es una fila en los arreglos; los enemigos
+    son una matriz (carrera, slot) con máscaras de activo y adelantado.
+    Cuando muere la mitad de las filas, el lote se compacta y race_ids
+    indica a qué carrera original corresponde cada fila.
+    """
+
+    def __init__(self, count, seed=None, levels=LEVELS,
+                 speed_up_every=SPEED_UP_EVERY):
+        """
+        Inicializa el lote de carreras
+
+        Args:
+            count: Cantidad de carreras del lote
+            seed: Semilla del generador aleatorio (None = no reproducible)
+            levels: Tabla de niveles con el formato de LEVELS
+            speed_up_every: Cada cuántos puntos aumenta la velocidad
+        """
+        self.count = count
+        self.rng = np.random.default_rng(seed)
+        self.speed_up_every = speed_up_every
+
+        # Tabla de niveles como arreglos para indexar por carrera
+        self.level_frequency = np.array([lvl['enemy_frequency'] for lvl in levels])
+        self.level_max_enemies = np.array([lvl['max_enemies'] for lvl in levels])
+        self.level_min_score = np.array([lvl['min_score'] for lvl in levels])
+
+        # Posición X de cada carril
+        lane_width = CANVAS_WIDTH // LANES
+        self.lane_x = np.arange(LANES) * lane_width + (lane_width - PLAYER_WIDTH) // 2
+        self.player_y = CANVAS_HEIGHT - PLAYER_HEIGHT - 20
+
+        self._init_races()
+        self._init_enemies(int(self.level_max_enemies.max()))
+
+
+    def _init_races(self):
+        """Inicializa el estado de cada carrera"""
+        n = self.count
+        self.race_ids = np.arange(n)
+        self._results = {
+            'score': np.zeros(n, dtype=np.int64),
+            'frames': np.zeros(n, dtype=np.int64),
+            'level': np.zeros(n, dtype=np.int64),
+            'alive': np.zeros(n, dtype=bool)
+        }
+
+        self.lane = np.full(n, (CANVAS_WIDTH // 2 - PLAYER_WIDTH // 2) // (CANVAS_WIDTH // LANES))
+        self.score = np.zeros(n, dtype=np.int64)
+        self.level = np.zeros(n, dtype=np.int64)
+        self.speed_multiplier = np.ones(n)
+        self.speed = np.full(n, float(BASE_SPEED))
+        self.frames = np.zeros(n, dtype=np.int64)
+        self.alive = np.ones(n, dtype=bool)
+
+
+    def _init_enemies(self, capacity):
+        """Inicializa la matriz de enemigos (carrera, slot)"""
+        shape = (self.count, capacity)
+        self.enemy_y = np.zeros(shape)
+        self.enemy_lane = np.zeros(shape, dtype=np.int64)
+        self.enemy_active = np.zeros(shape, dtype=bool)
+        self.enemy_passed = np.zeros(shape, dtype=bool)
+
+    # ========================================
+    # MÉTODOS DE ACTUALIZACIÓN
+    # ========================================
+
+    def step(self, actions=None):
+        """
+        Avanza un frame todas las carreras vivas
+
+        Args:
+            actions: Arreglo con -1, 0 o 1 por fila del lote, o None
+
+        Returns:
+            Cantidad de carreras que siguen vivas
+        """
+        alive = self.alive
+
+        if actions is not None:
+            moved = np.clip(self.lane + actions, 0, LANES - 1)
+            self.lane = np.where(alive, moved, self.lane)
+
+        self.frames += alive
+        self._spawn_enemies(alive)
+        self._move_enemies(alive)
+        self._check_passed(alive)
+        self._check_collisions()
+        self._cull_enemies()
+
+        alive_count = int(self.alive.sum())
+        if alive_count * 2 < self.alive.size:
+            self._compact()
+
+        return alive_count
+
+
+    def _spawn_enemies(self, alive):
+        """Genera enemigos en las carreras que cumplen la frecuencia del nivel"""
+        active_count = self.enemy_active.sum(axis=1)
+        spawn = (alive &
+                 (self.frames % self.level_frequency[self.level] == 0) &
+                 (active_count < self.level_max_enemies[self.level]))
+
+        rows = np.flatnonzero(spawn)
+        if rows.size == 0:
+            return
+
+        # Primer slot libre de cada carrera que genera enemigo
+        slots = np.argmin(self.enemy_active[rows], axis=1)
+        self.enemy_y[rows, slots] = -ENEMY_HEIGHT
+        self.enemy_lane[rows, slots] = self.rng.integers(0, LANES, size=rows.size)
+        self.enemy_active[rows, slots] = True
+        self.enemy_passed[rows, slots] = False
+
+
+    def _move_enemies(self, alive):
+        """Mueve los enemigos de las carreras vivas"""
+        self.enemy_y += (self.speed * alive)[:, None]
+
+
+    def _check_passed(self, alive):
+        """Suma puntos por los enemigos adelantados y actualiza velocidad y nivel"""
+        newly_passed = (self.enemy_active & ~self.enemy_passed &
+                        (self.enemy_y > self.player_y + PLAYER_HEIGHT) &
+                        alive[:, None])
+        self.enemy_passed |= newly_passed
+        self.score += newly_passed.sum(axis=1) * POINTS_PER_CAR
+
+        # Velocidad: solo aumenta, igual que Race._update_speed
+        multiplier = 1 + (self.score // self.speed_up_every) * SPEED_INCREMENT
+        self.speed_multiplier = np.maximum(self.speed_multiplier, multiplier)
+        self.speed = BASE_SPEED * self.speed_multiplier
+
+        # Nivel: el más alto cuyo min_score fue alcanzado
+        reached = np.searchsorted(self.level_min_score, self.score, side='right') - 1
+        self.level = np.maximum(self.level, reached)
+
+
+    def _check_collisions(self):
+        """Marca como muertas las carreras con colisión"""
+        player_x = self.lane_x[self.lane][:, None]
+        enemy_x = self.lane_x[self.enemy_lane]
+
+        hit = (self.enemy_active & ~self.enemy_passed &
+               (player_x < enemy_x + ENEMY_WIDTH) &
+               (player_x + PLAYER_WIDTH > enemy_x) &
+               (self.player_y < self.enemy_y + ENEMY_HEIGHT) &
+               (self.player_y + PLAYER_HEIGHT > self.enemy_y))
+
+        self.alive &= ~hit.any(axis=1)
+
+
+    def _cull_enemies(self):
+        """Libera los slots de enemigos fuera de pantalla"""
+        self.enemy_active &= self.enemy_y <= CANVAS_HEIGHT
+
+
+    def _compact(self):
+        """Guarda los resultados de las carreras terminadas y las quita del lote"""
+        done = ~self.alive
+        done_ids = self.race_ids[done]
+        self._results['score'][done_ids] = self.score[done]
+        self._results['frames'][done_ids] = self.frames[done]
+        self._results['level'][done_ids] = self.level[done]
+
+        keep = self.alive
+        self.race_ids = self.race_ids[keep]
+        self.lane = self.lane[keep]
+        self.score = self.score[keep]
+        self.level = self.level[keep]
+        self.speed_multiplier = self.speed_multiplier[keep]
+        self.speed = self.speed[keep]
+        self.frames = self.frames[keep]
+        self.alive = self.alive[keep]
+        self.enemy_y = self.enemy_y[keep]
+        self.enemy_lane = self.enemy_lane[keep]
+        self.enemy_active = self.enemy_active[keep]
+        self.enemy_passed = self.enemy_passed[keep]
+
+    # ========================================
+    # EJECUCIÓN Y RESULTADOS
+    # ========================================
+
+    def run(self, policy=None, max_frames=None):
+        """
+        Avanza el lote hasta que todas las carreras terminen
+
+        Args:
+            policy: Función policy(batch) que retorna el arreglo de acciones
+                    (una por fila del lote)
+            max_frames: Límite de frames a simular (None = hasta que choquen todas)
+
+        Returns:
+            Diccionario con los resultados por carrera
+        """
+        frame = 0
+        while self.alive.any():
+            if max_frames is not None and frame >= max_frames:
+                break
+            actions = policy(self) if policy else None
+            self.step(actions)
+            frame += 1
+
+        return self.get_results()
+
+
+    def get_results(self):
+        """Obtiene los resultados de cada carrera original como arreglos"""
+        results = {key: values.copy() for key, values in self._results.items()}
+        results['score'][self.race_ids] = self.score
+        results['frames'][self.race_ids] = self.frames
+        results['level'][self.race_ids] = self.level
+        results['alive'][self.race_ids] = self.alive
+        return results
@@ -0,0 +1,447 @@
+"""
+⏱️ BENCHMARKS - Juego de Carreras Retro
+Mide los caminos críticos de la simulación, el render y las puntuaciones.
+
+Todo corre con el driver de video "dummy" de SDL (sin ventana), con
+semillas fijas, para que los números sean comparables entre corridas.
+Los resultados se pueden guardar como línea base en JSON y las corridas
+siguientes reportan el cambio porcentual contra esa base. Además se
+verifica que, con el pool de EnemyStore ya lleno, la carrera no cree
+objetos Enemy (los fallos del pool dejan de crecer).
+
+Uso:
+    python benchmarks.py --save benchmark_baseline.json
+    python benchmarks.py --compare benchmark_baseline.json --threshold 10
+    python benchmarks.py --only draw --repeat 10
+"""
+
+# ============================================
+# IMPORTACIONES
+# ============================================
+import os
+
+# Sin ventana ni audio: debe definirse antes de importar pygame
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pygame
+
+from simulation import LEVELS
+from juego_completo import Game, Player, GREEN, RED
+from leaderboard import Leaderboard, SQLiteLeaderboard
+
+
+# Regresión: más lento que la base por encima de este porcentaje
+DEFAULT_THRESHOLD = 10.0
+
+# Frames de calentamiento antes de medir la simulación
+WARMUP_FRAMES = 300
+
+# Frames para llenar el pool de enemigos y luego para verificar que no crece
+POOL_CHECK_FRAMES = 3000
+
+# Partidas en el historial de puntuaciones a medir
+SCORE_FILE_SIZES = (3, 1000, 100000)
+
+
+# ============================================
+# CARGAS DE TRABAJO
+# ============================================
+
+class GhostPlayer(Player):
+    """Jugador que calcula las colisiones pero nunca choca, para medir sin cortes"""
+
+    def check_collision(self):
+        """Hace la misma verificación que Player pero no termina la carrera"""
+        super().check_collision()
+        return False
+
+
+def make_player(levels, score=0, seed=1):
+    """
+    Crea un jugador fijo en una tabla de niveles y con tráfico ya en pantalla
+
+    Args:
+        levels: Tabla de niveles (una sola fila fija el nivel)
+        score: Puntuación inicial (define la velocidad)
+        seed: Semilla del tráfico
+    """
+    player = GhostPlayer(1, 0, seed)
+    player.levels = levels
+    player.score = score
+    player._update_speed()
+
+    for _ in range(WARMUP_FRAMES):
+        player.update()
+    return player
+
+
+def bench_player_update(level):
+    """Player.update en un nivel de LEVELS"""
+    def setup():
+        player = make_player([level], level['min_score'])
+        return player.update
+    return setup
+
+
+def bench_player_update_crowded(max_enemies):
+    """Player.update con muchos enemigos en pantalla (un enemigo por frame)"""
+    levels = [{'name': 'SINTÉTICO', 'enemy_frequency': 1,
+               'max_enemies': max_enemies, 'min_score': 0}]
+
+    def setup():
+        player = make_player(levels)
+        return player.update
+    return setup
+
+
+def bench_draw_car(game):
+    """Player.draw_car de un enemigo y del jugador"""
+    def setup():
+        player = Player(1, 0, 1)
+        surface = game.surfaces.get_canvas(0)
+
+        def op():
+            player.draw_car(surface, 100, 300, RED)
+            player.draw_car(surface, 180, 500, player.color)
+        return op
+    return setup
+
+
+def bench_draw_road(game):
+    """Player.draw_road con la carretera desplazándose"""
+    def setup():
+        player = Player(1, 0, 1)
+        surface = game.surfaces.get_canvas(0)
+
+        def op():
+            player.road_offset += 3
+            player.draw_road(surface)
+        return op
+    return setup
+
+
+def bench_draw_text(game, changing):
+    """Game.draw_text con un texto fijo o con uno distinto en cada llamada"""
+    def setup():
+        counter = iter(range(10 ** 9))
+
+        def op():
+            text = f"Puntos: {next(counter)}" if changing else "Puntos: 123"
+            game.draw_text(text, game.font_tiny, GREEN, 60, 53, center=False)
+        return op
+    return setup
+
+
+def bench_draw_game(game, mode):
+    """Game.draw_game de una carrera en curso"""
+    def setup():
+        game.start_game(mode, seed=1)
+        game.stop_music()
+        game.players = [GhostPlayer(player.player_num, 0, 1) for player in game.players]
+        for _ in range(WARMUP_FRAMES):
+            game.update_game()
+        return game.draw_game
+    return setup
+
+
+def bench_scores(game, size, operation):
+    """save_score (con o sin cola), consultas o la carga inicial con size partidas"""
+    rng = random.Random(size)
+    records = [{'name': f"Jugador {rng.randint(1, 2)}", 'score': rng.randint(0, 500),
+                'date': '2024-01-01', 'mode': rng.choice(('single', 'multi'))}
+               for _ in range(size)]
+
+    def setup():
+        game.leaderboard.close()
+        game.writer.flush()
+        for path in (game.scores_file, 'scores.snapshot.json'):
+            if os.path.exists(path):
+                os.remove(path)
+        with open('scores.jsonl', 'w') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records))
+        writer = None if operation == 'save_sync' else game.writer
+        game.leaderboard = Leaderboard(game.scores_file, writer=writer)
+
+        if operation == 'load':
+            return game.get_top_scores
+        game.get_top_scores()
+        if operation == 'percentiles':
+            histogram = game.leaderboard.get_histogram()
+            return lambda: (histogram.rank(250), histogram.quantile(0.5), histogram.quantile(0.9))
+        if operation == 'get':
+            return game.get_top_scores
+        return lambda: game.save_score("Jugador 1", rng.randint(0, 500), 'single')
+    return setup
+
+
+def bench_sqlite(size, operation):
+    """Consultas y save_score de SQLiteLeaderboard con un historial de size partidas"""
+    path = f"scores_{size}.db"
+    rng = random.Random(size)
+
+    def setup():
+        if not os.path.exists(path):
+            leaderboard = SQLiteLeaderboard(path, batch_size=size, scores_file='sqlite_scores.json')
+            for _ in range(size):
+                leaderboard.add_score(f"Jugador {rng.randint(1, 2)}", rng.randint(0, 500),
+                                      f"2024-01-{rng.randint(1, 31):02d}",
+                                      rng.choice(('single', 'multi')))
+            leaderboard.close()
+
+        leaderboard = SQLiteLeaderboard(path, scores_file='sqlite_scores.json')
+        leaderboard.get_run_count()
+        if operation == 'top':
+            return lambda: leaderboard.get_top_scores(mode='multi')
+        if operation == 'page':
+            return lambda: leaderboard.get_page(100, 5)
+        if operation == 'player':
+            return lambda: leaderboard.get_top_scores(player="Jugador 2", since='2024-01-25')
+        if operation == 'player_best':
+            return lambda: leaderboard.get_top_scores(player="Jugador 2")
+        return lambda: leaderboard.add_score("Jugador 1", rng.randint(0, 500), mode='single')
+    return setup
+
+
+def build_benchmarks(game):
+    """
+    Arma la lista de benchmarks
+
+    Returns:
+        Lista de (nombre, setup, operaciones por repetición). setup()
+        prepara un estado nuevo y retorna la operación a medir.
+    """
+    benchmarks = []
+
+    for i, level in enumerate(LEVELS):
+        benchmarks.append((f"player_update_level_{i + 1}", bench_player_update(level), 5000))
+    for count in (50, 200):
+        benchmarks.append((f"player_update_{count}_enemies",
+                           bench_player_update_crowded(count), 2000))
+
+    benchmarks += [
+        ('draw_car', bench_draw_car(game), 5000),
+        ('draw_road', bench_draw_road(game), 2000),
+        ('draw_text_cached', bench_draw_text(game, False), 5000),
+        ('draw_text_changing', bench_draw_text(game, True), 2000),
+        ('draw_game_single', bench_draw_game(game, 'single'), 300),
+        ('draw_game_multi', bench_draw_game(game, 'multi'), 300)
+    ]
+
+    for size in SCORE_FILE_SIZES:
+        benchmarks.append((f"get_top_scores_{size}", bench_scores(game, size, 'get'), 200))
+        # Sin instantánea: la primera consulta relee todo el diario
+        benchmarks.append((f"load_scores_{size}", bench_scores(game, size, 'load'), 1))
+
+    # Rango y percentiles del game over: O(log B) sin importar el historial
+    benchmarks.append((f"score_percentiles_{SCORE_FILE_SIZES[-1]}",
+                       bench_scores(game, SCORE_FILE_SIZES[-1], 'percentiles'), 2000))
+
+    # save_score encola la escritura; save_score_sync escribe en el momento
+    benchmarks.append(('save_score', bench_scores(game, SCORE_FILE_SIZES[-1], 'save'), 200))
+    benchmarks.append(('save_score_sync', bench_scores(game, SCORE_FILE_SIZES[-1], 'save_sync'), 200))
+
+    # SQLite sin writer: save_score inserta cada partida en su transacción
+    size = SCORE_FILE_SIZES[-1]
+    benchmarks += [
+        (f"sqlite_top_scores_mode_{size}", bench_sqlite(size, 'top'), 200),
+        (f"sqlite_page_{size}", bench_sqlite(size, 'page'), 200),
+        (f"sqlite_player_week_{size}", bench_sqlite(size, 'player'), 20),
+        (f"sqlite_player_best_{size}", bench_sqlite(size, 'player_best'), 200),
+        ('sqlite_save_score', bench_sqlite(size, 'save'), 200)
+    ]
+
+    return benchmarks
+
+
+# ============================================
+# MEDICIÓN
+# ============================================
+
+def time_benchmark(setup, number, repeat):
+    """
+    Mide una operación en varias repeticiones, cada una con estado nuevo
+
+    Returns:
+        Diccionario con el mejor tiempo y la mediana por operación (µs)
+    """
+    times = []
+    for _ in range(repeat):
+        op = setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        times.append((time.perf_counter() - start) / number)
+
+    return {
+        'best_us': min(times) * 1e6,
+        'median_us': statistics.median(times) * 1e6,
+        'ops': number
+    }
+
+
+def check_enemy_pool(frames=POOL_CHECK_FRAMES):
+    """
+    Cuenta los objetos Enemy creados en régimen estable
+
+    Cada slot crea su objeto la primera vez que se usa, así que primero se
+    corren frames para llenar el pool y después se cuentan los fallos en
+    otros tantos frames.
+
+    Returns:
+        Diccionario {nivel: fallos del pool en la segunda tanda}; todo 0
+        si solo se reciclan objetos
+    """
+    crowded = {'name': 'SINTÉTICO', 'enemy_frequency': 1, 'max_enemies': 200, 'min_score': 0}
+    misses = {}
+    for level in LEVELS + [crowded]:
+        player = make_player([level], level['min_score'])
+        for _ in range(frames):
+            player.update()
+
+        before = player.enemies.get_pool_stats()['misses']
+        for _ in range(frames):
+            player.update()
+        misses[level['name']] = player.enemies.get_pool_stats()['misses'] - before
+    return misses
+
+
+def run_benchmarks(only=None, repeat=5):
+    """
+    Corre los benchmarks en un directorio temporal
+
+    Args:
+        only: Subcadena para filtrar benchmarks por nombre (None = todos)
+        repeat: Repeticiones de cada benchmark
+
+    Returns:
+        Diccionario con metadatos y resultados por benchmark
+    """
+    random.seed(0)
+    workdir = tempfile.mkdtemp(prefix='carrera_bench_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+
+    game = None
+    try:
+        game = Game()
+        results = {}
+        for name, setup, number in build_benchmarks(game):
+            if only and only not in name:
+                continue
+            results[name] = time_benchmark(setup, number, repeat)
+            print(f"   {name:<28} {results[name]['best_us']:>10.2f} µs")
+    finally:
+        if game is not None:
+            game.writer.close()
+        pygame.quit()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+# ============================================
+# LÍNEAS BASE
+# ============================================
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compara los mejores tiempos contra una línea base
+
+    Returns:
+        Lista de nombres de benchmarks más lentos que la base por encima
+        de threshold por ciento
+    """
+    regressions = []
+    print(f"\n{'benchmark':<28} {'base µs':>10} {'actual µs':>10} {'cambio':>9}")
+
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<28} {'-':>10} {result['best_us']:>10.2f} {'nuevo':>9}")
+            continue
+
+        change = (result['best_us'] - base['best_us']) / base['best_us'] * 100
+        mark = ''
+        if change > threshold:
+            regressions.append(name)
+            mark = ' ⚠️'
+        print(f"{name:<28} {base['best_us']:>10.2f} {result['best_us']:>10.2f} "
+              f"{change:>+8.1f}%{mark}")
+
+    return regressions
+
+
+def main(argv=None):
+    """Lee los argumentos, corre los benchmarks y guarda o compara la base"""
+    parser = argparse.ArgumentParser(description="Benchmarks de simulación, render y puntuaciones")
+    parser.add_argument('--save', default=None,
+                        help="Guardar los resultados como línea base en este JSON")
+    parser.add_argument('--compare', default=None,
+                        help="Línea base JSON contra la que comparar")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Porcentaje de lentitud que cuenta como regresión")
+    parser.add_argument('--only', default=None,
+                        help="Correr solo los benchmarks cuyo nombre contiene este texto")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Repeticiones de cada benchmark (se reporta la mejor)")
+    args = parser.parse_args(argv)
+
+    # Leer la base antes de medir, para fallar rápido si no existe
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+
+    print("⏱️ Corriendo benchmarks...")
+    current = run_benchmarks(args.only, args.repeat)
+
+    pool_misses = {}
+    if not args.only or args.only in 'enemy_pool':
+        pool_misses = check_enemy_pool()
+        current['enemy_pool_misses'] = pool_misses
+        print(f"   {'enemy_pool':<28} {sum(pool_misses.values()):>10} objetos nuevos "
+              f"en {POOL_CHECK_FRAMES} frames por nivel (pool ya lleno)")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"\n💾 Línea base guardada en {args.save}")
+
+    allocating = [name for name, misses in pool_misses.items() if misses]
+    if allocating:
+        print(f"\n⚠️ El pool de enemigos sigue creando objetos en: {', '.join(allocating)}")
+
+    if baseline is not None:
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regresiones de más de {args.threshold:.0f}%: "
+                  f"{', '.join(regressions)}")
+            return 1
+        print("\n✅ Sin regresiones")
+    return 1 if allocating else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+🤖 BOTS - Juego de Carreras Retro
+Políticas de conducción para carreras sin ventana.
+
+Cada política se crea con make_policy(nombre, seed) y se llama como
+policy(race), retornando la lista de acciones del frame. idle y dodge
+solo dependen del estado de la carrera, así que dan el mismo resultado
+con simulation.run_race y con event_simulation.run_race_events.
+"""
+
+# ============================================
+# IMPORTACIONES
+# ============================================
+import random
+
+from simulation import LANES
+
+
+# ============================================
+# POLÍTICAS
+# ============================================
+
+def idle_policy(race):
+    """No se mueve nunca"""
+    return ()
+
+
+def _lane_clearance(race, lane):
+    """Distancia libre delante del jugador en un carril"""
+    front_y = race.enemies.lane_front_y(lane)
+    if front_y is None:
+        return float('inf')
+    return race.y - front_y
+
+
+def dodge_policy(race):
+    """Se mueve hacia el carril con más espacio libre delante"""
+    lane = race.get_current_lane()
+    target = max(range(LANES), key=lambda l: _lane_clearance(race, l))
+
+    if _lane_clearance(race, lane) >= _lane_clearance(race, target):
+        return ()
+    return ['left'] if target < lane else ['right']
+
+
+def make_random_policy(seed=None):
+    """Crea una política que cambia de carril al azar en cada evento"""
+    rng = random.Random(seed)
+
+    def random_policy(race):
+        return rng.choice((['left'], ['right'], ()))
+
+    return random_policy
+
+
+POLICIES = {
+    'idle': lambda seed: idle_policy,
+    'dodge': lambda seed: dodge_policy,
+    'random': make_random_policy
+}
+
+
+def make_policy(name, seed=None):
+    """
+    Crea una política por nombre
+
+    Args:
+        name: Nombre de la política ('idle', 'dodge' o 'random')
+        seed: Semilla para las políticas aleatorias
+    """
+    if name not in POLICIES:
+        raise ValueError(f"Política desconocida: {name} (opciones: {', '.join(POLICIES)})")
+    return POLICIES[name](seed)
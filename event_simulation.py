@@ -0,0 +1,141 @@
+"""
+🏁 SIMULACIÓN POR EVENTOS - Juego de Carreras Retro
+Salta directamente al siguiente frame donde pasa algo.
+
+Entre apariciones, adelantamientos, aumentos de velocidad y colisiones la
+carrera es totalmente predecible: los enemigos bajan self.speed por frame
+y aparecen cada enemy_frequency frames. Aquí se calcula cuántos frames
+faltan para el próximo evento, se avanzan de una vez con Race.skip_frames
+y el frame del evento se simula con Race.step, así que el resultado es
+idéntico al de simular frame por frame.
+
+Uso básico:
+    # Una hora de juego con un guion de entradas
+    schedule = [(120, 'left'), (400, 'right')]
+    resultado = run_race_events(schedule, max_frames=60 * 60 * TICK_RATE, seed=1)
+"""
+
+# ============================================
+# IMPORTACIONES
+# ============================================
+from collections import deque
+
+from simulation import (
+    Race, CANVAS_HEIGHT, PLAYER_HEIGHT, ENEMY_HEIGHT, LEVELS
+)
+
+
+# ============================================
+# CÁLCULO DE EVENTOS
+# ============================================
+
+def frames_until_above(y, limit, speed):
+    """Frames hasta que un enemigo en y quede por debajo de limit (mínimo 1)"""
+    if y > limit:
+        return 1
+    return int((limit - y) // speed) + 1
+
+
+def frames_until_event(race):
+    """
+    Calcula cuántos frames faltan para el próximo frame con algún evento
+
+    Un evento es una aparición, un adelantamiento (que puede cambiar
+    velocidad y nivel), una colisión o una salida de pantalla (que libera
+    espacio para aparecer).
+
+    Returns:
+        Frames hasta el evento (mínimo 1) o None si no habrá ninguno
+    """
+    enemies = race.enemies
+    speed = race.speed
+    level = race.levels[race.level]
+    candidates = []
+
+    # Aparición: siguiente múltiplo de la frecuencia, si hay espacio
+    if len(enemies) < level['max_enemies']:
+        frequency = level['enemy_frequency']
+        candidates.append(frequency - race.frame_count % frequency)
+
+    if enemies.count:
+        y = enemies.y
+        scroll = enemies.scroll
+
+        # Salida de pantalla del enemigo más antiguo
+        candidates.append(frames_until_above(y[enemies.head] + scroll,
+                                             CANVAS_HEIGHT, speed))
+
+        # Adelantamiento del primer enemigo no adelantado
+        if enemies.passed_count < enemies.count:
+            slot = (enemies.head + enemies.passed_count) % enemies.capacity
+            candidates.append(frames_until_above(y[slot] + scroll,
+                                                 race.y + PLAYER_HEIGHT, speed))
+
+        # Colisión con el primer enemigo no adelantado del carril del jugador
+        front_y = enemies.lane_front_y(race.get_current_lane())
+        if front_y is not None:
+            candidates.append(frames_until_above(front_y, race.y - ENEMY_HEIGHT, speed))
+
+    return min(candidates) if candidates else None
+
+
+# ============================================
+# EJECUCIÓN POR EVENTOS
+# ============================================
+
+def run_race_events(schedule=(), policy=None, max_frames=None, race=None, seed=None,
+                    levels=LEVELS):
+    """
+    Corre una carrera saltando los frames sin eventos
+
+    Args:
+        schedule: Pares (frame, acción) con las entradas del guion; la
+                  acción se aplica al simular ese número de frame
+        policy: Bot opcional policy(race) que retorna acciones. Se consulta
+                después de cada frame simulado; mientras retorne acciones
+                se avanza frame por frame, y si no, se salta al próximo
+                evento. Un bot que solo mira el estado de la carrera da el
+                mismo resultado que con simulation.run_race.
+        max_frames: Límite de frames a simular (None = hasta chocar)
+        race: Carrera a continuar (por defecto una nueva)
+        seed: Semilla de la carrera nueva (se ignora si se pasa race)
+        levels: Tabla de niveles de la carrera nueva
+
+    Returns:
+        Diccionario con el resultado de la carrera
+    """
+    if race is None:
+        race = Race(seed, levels)
+
+    pending = deque(sorted(schedule, key=lambda entry: entry[0]))
+    policy_actions = list(policy(race)) if policy else []
+
+    while race.alive:
+        if max_frames is not None and race.frame_count >= max_frames:
+            break
+
+        # Frames hasta el próximo evento, entrada del guion o límite
+        remaining = frames_until_event(race)
+        limits = [remaining] if remaining is not None else []
+        if pending:
+            limits.append(max(1, pending[0][0] - race.frame_count))
+        if max_frames is not None:
+            limits.append(max_frames - race.frame_count)
+        if policy_actions:
+            limits.append(1)
+        if not limits:
+            break  # Nada volverá a pasar: la carrera no termina nunca
+
+        race.skip_frames(min(limits) - 1)
+
+        # Simular normalmente el frame del evento
+        frame = race.frame_count + 1
+        actions = []
+        while pending and pending[0][0] <= frame:
+            actions.append(pending.popleft()[1])
+        actions.extend(policy_actions)  # Si hay, no se saltaron frames
+
+        race.step(actions)
+        policy_actions = list(policy(race)) if policy else []
+
+    return race.get_result()
@@ -0,0 +1,188 @@
+"""
+📈 HISTOGRAMA DE PUNTUACIONES - Juego de Carreras Retro
+Percentiles de todo el historial de partidas sin recorrerlo.
+
+Las puntuaciones se cuentan en baldes fijos: un balde por valor por
+debajo de EXACT_SCORES (ahí los percentiles son exactos) y, por encima,
+SUB_BUCKETS baldes por cada potencia de dos (error relativo menor a
+1/SUB_BUCKETS). La cantidad de baldes no depende de cuántas partidas
+haya.
+
+Los conteos viven en un árbol de Fenwick, así que agregar una partida,
+calcular a cuántas partidas supera una puntuación y buscar un percentil
+cuestan O(log B), con B la cantidad de baldes. No depende de Pygame.
+
+Uso básico:
+    histogram = ScoreHistogram()
+    histogram.add(42)
+    print(histogram.rank(42), histogram.quantile(0.5))
+"""
+
+# ============================================
+# IMPORTACIONES
+# ============================================
+import math
+
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+
+# Puntuaciones con balde propio: 0 .. EXACT_SCORES - 1
+EXACT_BITS = 10
+EXACT_SCORES = 1 << EXACT_BITS
+
+# Baldes por potencia de dos por encima de EXACT_SCORES
+SUB_BITS = 6
+SUB_BUCKETS = 1 << SUB_BITS
+
+# Puntuaciones desde 2 ** MAX_BITS van al último balde
+MAX_BITS = 32
+
+BUCKET_COUNT = EXACT_SCORES + (MAX_BITS - EXACT_BITS) * SUB_BUCKETS
+
+
+def get_bucket(score):
+    """Índice del balde de una puntuación"""
+    score = max(int(score), 0)
+    if score < EXACT_SCORES:
+        return score
+
+    exponent = score.bit_length() - 1
+    if exponent >= MAX_BITS:
+        return BUCKET_COUNT - 1
+    sub = (score >> (exponent - SUB_BITS)) - SUB_BUCKETS
+    return EXACT_SCORES + (exponent - EXACT_BITS) * SUB_BUCKETS + sub
+
+
+def get_bucket_floor(bucket):
+    """Menor puntuación que cae en un balde"""
+    if bucket < EXACT_SCORES:
+        return bucket
+
+    exponent, sub = divmod(bucket - EXACT_SCORES, SUB_BUCKETS)
+    exponent += EXACT_BITS
+    return (SUB_BUCKETS + sub) << (exponent - SUB_BITS)
+
+
+# ============================================
+# CLASE SCOREHISTOGRAM
+# ============================================
+
+class ScoreHistogram:
+    """
+    Histograma de puntuaciones con consultas de rango en O(log B).
+
+    tree es un árbol de Fenwick de BUCKET_COUNT posiciones (índice 1 en
+    adelante); counts guarda los mismos conteos por balde, sin ceros, para
+    persistirlos.
+    """
+
+    def __init__(self, counts=None):
+        """
+        Inicializa el histograma
+
+        Args:
+            counts: Conteos por balde {balde: partidas} para continuar un
+                    histograma guardado (None = vacío)
+        """
+        self.counts = {}
+        self.tree = [0] * (BUCKET_COUNT + 1)
+        self.total = 0
+
+        for bucket, count in (counts or {}).items():
+            bucket = int(bucket)
+            if 0 <= bucket < BUCKET_COUNT and count > 0:
+                self.counts[bucket] = count
+                self.tree[bucket + 1] = count
+                self.total += count
+
+        # Construcción del árbol en O(B): cada nodo suma en su padre
+        for i in range(1, BUCKET_COUNT + 1):
+            parent = i + (i & -i)
+            if parent <= BUCKET_COUNT:
+                self.tree[parent] += self.tree[i]
+
+    # ========================================
+    # ACTUALIZACIÓN
+    # ========================================
+
+    def add(self, score, count=1):
+        """Cuenta count partidas con esta puntuación"""
+        bucket = get_bucket(score)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += count
+
+        i = bucket + 1
+        while i <= BUCKET_COUNT:
+            self.tree[i] += count
+            i += i & -i
+
+    # ========================================
+    # CONSULTAS
+    # ========================================
+
+    def _count_below(self, bucket):
+        """Partidas en los baldes anteriores a bucket"""
+        count = 0
+        i = bucket
+        while i > 0:
+            count += self.tree[i]
+            i -= i & -i
+        return count
+
+
+    def rank(self, score):
+        """
+        Porcentaje de partidas con menos puntos que score (0 sin partidas)
+        """
+        if not self.total:
+            return 0.0
+        return 100 * self._count_below(get_bucket(score)) / self.total
+
+
+    def quantile(self, q):
+        """
+        Puntuación del percentil q (0..1), o None sin partidas
+
+        Es la menor puntuación que alcanza a cubrir q del total; por encima
+        de EXACT_SCORES, el piso de su balde.
+        """
+        if not self.total:
+            return None
+
+        target = max(1, math.ceil(q * self.total))
+
+        # Bajar por el árbol buscando la última posición con menos de target
+        position = 0
+        remaining = target
+        step = 1 << BUCKET_COUNT.bit_length()
+        while step:
+            next_position = position + step
+            if next_position <= BUCKET_COUNT and self.tree[next_position] < remaining:
+                position = next_position
+                remaining -= self.tree[next_position]
+            step >>= 1
+
+        return get_bucket_floor(min(position, BUCKET_COUNT - 1))
+
+    # ========================================
+    # PERSISTENCIA
+    # ========================================
+
+    def to_dict(self):
+        """Datos para guardar en JSON (conteos por balde y su disposición)"""
+        return {
+            'exact_scores': EXACT_SCORES,
+            'sub_buckets': SUB_BUCKETS,
+            'counts': {str(bucket): count for bucket, count in self.counts.items()}
+        }
+
+
+    @classmethod
+    def from_dict(cls, data):
+        """Histograma guardado con to_dict, o None si tiene otra disposición de baldes"""
+        if (not isinstance(data, dict) or data.get('exact_scores') != EXACT_SCORES
+                or data.get('sub_buckets') != SUB_BUCKETS):
+            return None
+        return cls(data.get('counts'))
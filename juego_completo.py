@@ -13,13 +13,25 @@ Autor: Convertido de JavaScript a Python con Pygame
 # IMPORTACIONES
 # ============================================
 import pygame
+import argparse
+import cProfile
+import io
+import marshal
+import pstats
 import sys
 import json
 import os
 import time
 import random
+from collections import OrderedDict, deque
 from datetime import datetime
 
+from simulation import (
+    Race, CANVAS_WIDTH, CANVAS_HEIGHT, LANES, TICK_RATE, LEVELS
+)
+from leaderboard import Leaderboard, SQLiteLeaderboard
+from persistence import BackgroundWriter
+
 
 # ============================================
 # CONFIGURACIÓN DEL JUEGO
@@ -30,52 +42,32 @@ SCREEN_WIDTH = 1024
 SCREEN_HEIGHT = 768
 FPS = 60
 
-# Configuración del canvas del juego
-CANVAS_WIDTH = 400
-CANVAS_HEIGHT = 600
+# Simulación a paso fijo: la velocidad del juego no depende de los FPS
+SIM_TICK = 1 / TICK_RATE
+MAX_SIM_TICKS_PER_FRAME = 5  # Bajo carga se saltan frames de render, no de simulación
 
-# Configuración del jugador
-PLAYER_WIDTH = 40
-PLAYER_HEIGHT = 60
+# Pulso del título del menú: el menú se recompone solo cuando cambia el tono
+TITLE_PULSE_PERIOD = 2000  # Milisegundos por ciclo
+TITLE_PULSE_STEPS = 32  # Tonos por ciclo
 
-# Configuración de enemigos
-ENEMY_WIDTH = 40
-ENEMY_HEIGHT = 60
+# Ritmo adaptativo: 60 FPS solo cuando algo se mueve
+MENU_FPS = 1000 // (TITLE_PULSE_PERIOD // TITLE_PULSE_STEPS)  # Un frame por tono del título
+IDLE_WAIT_MS = 1000  # Pantallas quietas: se espera un evento hasta este tiempo
+# Sin foco: un frame debe caber en el tope de ticks con un tick de margen,
+# porque clock.tick suele dormir de más y lo que pase del tope se pierde
+UNFOCUSED_FPS = TICK_RATE // (MAX_SIM_TICKS_PER_FRAME - 1)
 
-# Configuración de la carretera
-ROAD_WIDTH = 80
-LANES = 3
+# Perfilador de frames (F3)
+PROFILER_WINDOW = 300  # Frames en la ventana de percentiles
+PROFILER_REFRESH = 30  # Cada cuántos frames se recalculan las estadísticas
+DROPPED_FRAME_FACTOR = 1.5  # Un frame que tarda más que esto × el presupuesto se cuenta perdido
 
-# Configuración de juego
-BASE_SPEED = 3
-SPEED_INCREMENT = 0.5
-POINTS_PER_CAR = 1
-SPEED_UP_EVERY = 10
+# Captura de cProfile (F4)
+PROFILE_DIR = 'profiles'
+PROFILE_TOP = 30  # Funciones en el resumen de cada captura
 
-
-# ============================================
-# NIVELES DE DIFICULTAD
-# ============================================
-LEVELS = [
-    {
-        'name': 'FÁCIL',
-        'enemy_frequency': 100,
-        'max_enemies': 3,
-        'min_score': 0
-    },
-    {
-        'name': 'MEDIO',
-        'enemy_frequency': 70,
-        'max_enemies': 4,
-        'min_score': 50
-    },
-    {
-        'name': 'DIFÍCIL',
-        'enemy_frequency': 50,
-        'max_enemies': 5,
-        'min_score': 100
-    }
-]
+# Pantalla de puntuaciones
+SCORES_PER_PAGE = 5  # Filas por página (solo se leen las de la página visible)
 
 
 # ============================================
@@ -212,196 +204,991 @@ PLAYER2_CONTROLS = {
 
 
 # ============================================
-# CLASE PLAYER
+# ATLAS DE SPRITES DE AUTOS
 # ============================================
 
-class Player:
+# Color transparente de los sprites (no lo usa ninguna piel)
+SPRITE_COLORKEY = (255, 0, 255)
+
+# Colores de los autos enemigos y de las pieles bloqueadas en la tienda
+ENEMY_COLORS = (RED, CYAN, BLACK)
+LOCKED_SKIN_COLORS = (GRAY, DARK_GRAY, BLACK)
+
+# Formas de los autos: rectángulos (x, y, ancho, alto) de cada parte
+MINI_CAR_SCALE = 1.5
+
+CAR_SHAPES = {
+    'car': {
+        'size': (40, 50),
+        'body': [(5, 0, 30, 50)],
+        'window': [(8, 10, 24, 15)],
+        'wheels': [(0, 5, 8, 12), (32, 5, 8, 12), (0, 33, 8, 12), (32, 33, 8, 12)]
+    },
+    'mini': {
+        'size': (int(60 * MINI_CAR_SCALE), int(75 * MINI_CAR_SCALE) + 1),
+        'body': [(7 * MINI_CAR_SCALE, 0, 45 * MINI_CAR_SCALE, 75 * MINI_CAR_SCALE)],
+        'window': [(12 * MINI_CAR_SCALE, 15 * MINI_CAR_SCALE,
+                    36 * MINI_CAR_SCALE, 22 * MINI_CAR_SCALE)],
+        'wheels': [(x * MINI_CAR_SCALE, y * MINI_CAR_SCALE,
+                    12 * MINI_CAR_SCALE, 18 * MINI_CAR_SCALE)
+                   for x, y in ((0, 7), (48, 7), (0, 50), (48, 50))]
+    }
+}
+
+
+class CarSpriteAtlas:
     """
-    Clase que representa a un jugador en el juego.
-    Maneja el movimiento, colisiones, puntuación y renderizado del jugador.
+    Autos pre-renderizados, uno por forma y combinación de colores.
+    Las superficies están en el formato de la pantalla (convert()), así que
+    el atlas se reconstruye cuando cambia el modo de video.
+    """
+    
+    def __init__(self):
+        """Inicializa el atlas vacío"""
+        self.sprites = {}
+    
+    
+    def get(self, body, window, wheels, shape='car'):
+        """Obtiene el sprite de un auto, rasterizándolo la primera vez"""
+        key = (shape, body, window, wheels)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.sprites[key] = self._rasterize(CAR_SHAPES[shape], body, window, wheels)
+        return sprite
+    
+    
+    def get_skin(self, skin, shape='car'):
+        """Obtiene el sprite de un auto con los colores de una piel"""
+        return self.get(skin['body'], skin['window'], skin['wheels'], shape)
+    
+    
+    def build_all(self):
+        """Rasteriza de nuevo todas las pieles, los enemigos y las tarjetas de la tienda"""
+        self.sprites.clear()
+        
+        for skin in CAR_SKINS + CAR_SKINS_P2:
+            self.get_skin(skin, 'car')
+            self.get_skin(skin, 'mini')
+        
+        self.get(*ENEMY_COLORS)
+        self.get(*LOCKED_SKIN_COLORS, shape='mini')
+    
+    
+    def _rasterize(self, shape, body, window, wheels):
+        """Dibuja un auto una sola vez en su propia superficie"""
+        sprite = pygame.Surface(shape['size'])
+        sprite.fill(SPRITE_COLORKEY)
+        
+        for rect in shape['body']:
+            pygame.draw.rect(sprite, body, rect)
+        for rect in shape['window']:
+            pygame.draw.rect(sprite, window, rect)
+        for rect in shape['wheels']:
+            pygame.draw.rect(sprite, wheels, rect)
+        
+        sprite = sprite.convert()
+        sprite.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+        return sprite
+
+
+# Atlas compartido por los jugadores y la tienda
+car_sprites = CarSpriteAtlas()
+
+
+# ============================================
+# TEXTURA DE LA CARRETERA
+# ============================================
+
+# Líneas discontinuas: una de ROAD_DASH_LENGTH píxeles cada ROAD_DASH_PERIOD
+ROAD_DASH_PERIOD = 40
+ROAD_DASH_LENGTH = 20
+
+
+class RoadTexture:
+    """
+    Carretera pre-renderizada (fondo y líneas de carril) en una superficie
+    ROAD_DASH_PERIOD píxeles más alta que el canvas. Como el dibujo se
+    repite cada ROAD_DASH_PERIOD, el desplazamiento es un solo blit.
+    Se reconstruye sola si cambian los carriles, el canvas o los colores.
+    """
+    
+    def __init__(self):
+        """Inicializa la textura vacía"""
+        self.surface = None
+        self.key = None
+    
+    
+    def get(self):
+        """Obtiene la textura, rasterizándola si cambió la configuración"""
+        key = (LANES, CANVAS_WIDTH, CANVAS_HEIGHT, GRAY, WHITE)
+        if self.surface is None or key != self.key:
+            self.surface = self._render()
+            self.key = key
+        return self.surface
+    
+    
+    def clear(self):
+        """Descarta la textura (por ejemplo al cambiar el modo de video)"""
+        self.surface = None
+    
+    
+    def draw(self, surface, x_offset, road_offset):
+        """Dibuja la carretera desplazada road_offset píxeles"""
+        y = int(road_offset % ROAD_DASH_PERIOD) - ROAD_DASH_PERIOD
+        surface.blit(self.get(), (x_offset, y))
+    
+    
+    def _render(self):
+        """Dibuja el fondo y las líneas de carril una sola vez"""
+        height = CANVAS_HEIGHT + ROAD_DASH_PERIOD
+        texture = pygame.Surface((CANVAS_WIDTH, height))
+        texture.fill(GRAY)
+        
+        lane_width = CANVAS_WIDTH // LANES
+        for i in range(1, LANES):
+            x = i * lane_width
+            for y in range(0, height, ROAD_DASH_PERIOD):
+                pygame.draw.line(texture, WHITE, (x, y), (x, y + ROAD_DASH_LENGTH), 2)
+        
+        return texture.convert()
+
+
+# Textura compartida por los canvas de los jugadores
+road_texture = RoadTexture()
+
+
+# ============================================
+# SUPERFICIES PERSISTENTES
+# ============================================
+
+class SurfaceManager:
+    """
+    Superficies grandes que se reutilizan entre frames: los canvas de los
+    jugadores y las capas semi-transparentes. Están en el formato de la
+    pantalla y solo se recrean cuando cambia la resolución o el modo.
     """
     
-    def __init__(self, player_num, x_offset=0):
+    def __init__(self):
+        """Inicializa el administrador sin superficies"""
+        self.canvases = {}
+        self.overlays = {}
+        self.layers = {}
+        self.layer_keys = {}
+    
+    
+    def get_canvas(self, index):
+        """Obtiene el canvas de juego del jugador en la posición index"""
+        canvas = self.canvases.get(index)
+        if canvas is None:
+            canvas = pygame.Surface((CANVAS_WIDTH, CANVAS_HEIGHT)).convert()
+            self.canvases[index] = canvas
+        return canvas
+    
+    
+    def get_overlay(self, alpha, color=BLACK):
+        """Obtiene una capa del tamaño de la pantalla con color y transparencia"""
+        key = (alpha, color)
+        overlay = self.overlays.get(key)
+        if overlay is None:
+            overlay = pygame.Surface(pygame.display.get_surface().get_size()).convert()
+            overlay.fill(color)
+            overlay.set_alpha(alpha)
+            self.overlays[key] = overlay
+        return overlay
+    
+    
+    def get_layer(self, name, key):
         """
-        Inicializa un jugador
+        Obtiene una capa del tamaño de la pantalla para una escena cacheada
+        
+        Returns:
+            Tupla (superficie, vigente); vigente es False si la capa es nueva
+            o su clave cambió, y hay que redibujarla
+        """
+        layer = self.layers.get(name)
+        if layer is None:
+            layer = pygame.Surface(pygame.display.get_surface().get_size()).convert()
+            self.layers[name] = layer
+        
+        valid = name in self.layer_keys and self.layer_keys[name] == key
+        self.layer_keys[name] = key
+        return layer, valid
+    
+    
+    def reset(self):
+        """Descarta todas las superficies (cambio de resolución o de modo)"""
+        self.canvases.clear()
+        self.overlays.clear()
+        self.layers.clear()
+        self.layer_keys.clear()
+
+
+# ============================================
+# CACHÉ DE TEXTOS
+# ============================================
+
+class TextCache:
+    """
+    Caché acotada de textos renderizados con política 2Q.
+
+    Un texto nuevo entra a una cola FIFO de prueba; volver a dibujarlo
+    mientras sigue ahí no lo promueve. Al salir de la cola se recuerda
+    solo su clave, y si se vuelve a pedir pasa a la zona principal (LRU).
+    Así los textos que cambian seguido ("Puntos: N") se usan unos frames y
+    se olvidan, sin desalojar las etiquetas fijas de los menús.
+    """
+    
+    def __init__(self, main_size=192, probation_size=64, ghost_size=128):
+        """
+        Inicializa la caché
         
         Args:
-            player_num: Número del jugador (1 o 2)
-            x_offset: Desplazamiento horizontal para modo multijugador
+            main_size: Superficies en la zona principal (LRU)
+            probation_size: Superficies en la cola de prueba (FIFO)
+            ghost_size: Claves recordadas de textos que salieron de prueba
         """
-        self.player_num = player_num
-        self.x_offset = x_offset
+        self.main_size = main_size
+        self.probation_size = probation_size
+        self.ghost_size = ghost_size
         
-        # Posición inicial del jugador
-        self._init_position()
+        self.main = OrderedDict()
+        self.probation = OrderedDict()
+        self.ghosts = OrderedDict()
         
-        # Estadísticas del jugador
-        self._init_stats()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    
+    def render(self, font, text, color, antialias=True):
+        """Obtiene la superficie de un texto, renderizándola solo si no está en caché"""
+        key = (font, text, color, antialias)
         
-        # Enemigos y gestión del juego
-        self._init_game_state()
+        surface = self.main.get(key)
+        if surface is not None:
+            self.main.move_to_end(key)
+            self.hits += 1
+            return surface
         
-        # Controles y apariencia
-        self._init_controls_and_appearance()
+        surface = self.probation.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+        
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        
+        if key in self.ghosts:
+            # Se volvió a pedir después de salir de prueba: es un texto frecuente
+            del self.ghosts[key]
+            self._add_to_main(key, surface)
+        else:
+            self._add_to_probation(key, surface)
+        return surface
     
     
-    def _init_position(self):
-        """Inicializa la posición del jugador"""
-        self.x = CANVAS_WIDTH // 2 - PLAYER_WIDTH // 2
-        self.y = CANVAS_HEIGHT - PLAYER_HEIGHT - 20
+    def _add_to_probation(self, key, surface):
+        """Agrega un texto nuevo a la cola de prueba"""
+        self.probation[key] = surface
+        if len(self.probation) > self.probation_size:
+            old_key, _ = self.probation.popitem(last=False)
+            self.evictions += 1
+            
+            self.ghosts[old_key] = None
+            if len(self.ghosts) > self.ghost_size:
+                self.ghosts.popitem(last=False)
+    
+    
+    def _add_to_main(self, key, surface):
+        """Agrega un texto frecuente a la zona principal"""
+        self.main[key] = surface
+        if len(self.main) > self.main_size:
+            self.main.popitem(last=False)
+            self.evictions += 1
+    
+    
+    def clear(self):
+        """Vacía la caché"""
+        self.main.clear()
+        self.probation.clear()
+        self.ghosts.clear()
+    
+    
+    def get_stats(self):
+        """Obtiene los contadores de la caché"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.main) + len(self.probation)
+        }
+
+
+# ============================================
+# REGIONES MODIFICADAS (DIRTY RECTS)
+# ============================================
+
+class DirtyRectTracker:
+    """
+    Decide qué partes de la pantalla hay que redibujar y presentar.
+
+    Cada escena describe sus regiones como pares (rect, clave), donde la
+    clave resume lo que se ve en esa región (hover, puntos, frame...).
+    Solo las regiones cuya clave cambió desde el frame anterior se
+    redibujan y se envían con pygame.display.update(rects). Un cambio de
+    escena o invalidate() fuerzan un redibujado completo con flip().
+    """
     
+    def __init__(self):
+        """Inicializa el seguimiento sin escena previa"""
+        self.scene = None
+        self.keys = {}
+        self.full_redraw = True
     
-    def _init_stats(self):
-        """Inicializa las estadísticas del jugador"""
-        self.score = 0
-        self.level = 0
-        self.speed = BASE_SPEED
-        self.speed_multiplier = 1.0
-        self.alive = True
+        self.full_frames = 0
+        self.partial_frames = 0
+        self.presented_area = 0
+        self.screen_area = 0
     
     
-    def _init_game_state(self):
-        """Inicializa el estado del juego para este jugador"""
-        self.enemies = []
-        self.road_offset = 0
-        self.frame_count = 0
-        self.passed_enemies = set()
+    def invalidate(self):
+        """Fuerza un redibujado completo en el próximo frame"""
+        self.full_redraw = True
     
     
-    def _init_controls_and_appearance(self):
-        """Inicializa controles y apariencia del jugador"""
-        self.controls = PLAYER1_CONTROLS if self.player_num == 1 else PLAYER2_CONTROLS
-        self.color = GREEN if self.player_num == 1 else YELLOW
+    def needs_full_redraw(self, scene):
+        """Indica si la escena cambió o la pantalla fue invalidada"""
+        return self.full_redraw or scene != self.scene
+    
+    
+    def commit(self, scene, regions):
+        """Registra las regiones de un frame redibujado por completo"""
+        self.scene = scene
+        self.keys = {tuple(rect): key for rect, key in regions}
+        self.full_redraw = False
+    
+        area = self._screen_area()
+        self.full_frames += 1
+        self.presented_area += area
+        self.screen_area += area
+    
+    
+    def diff(self, regions):
+        """
+        Compara las regiones con las del frame anterior
+    
+        Returns:
+            Lista de rects cuya clave cambió (vacía si no cambió nada)
+        """
+        keys = {tuple(rect): key for rect, key in regions}
+        dirty = [pygame.Rect(rect) for rect, key in keys.items()
+                 if rect not in self.keys or self.keys[rect] != key]
+        self.keys = keys
+    
+        self.partial_frames += 1
+        self.presented_area += sum(rect.width * rect.height for rect in dirty)
+        self.screen_area += self._screen_area()
+        return dirty
+    
+    
+    def _screen_area(self):
+        """Píxeles de la pantalla actual"""
+        width, height = pygame.display.get_surface().get_size()
+        return width * height
+    
+    
+    def get_stats(self):
+        """Obtiene los contadores de frames y la fracción de pantalla presentada"""
+        return {
+            'full_frames': self.full_frames,
+            'partial_frames': self.partial_frames,
+            'presented_fraction': self.presented_area / self.screen_area if self.screen_area else 0.0
+        }
+
+
+# ============================================
+# RITMO DE FRAMES
+# ============================================
+
+class FramePacer:
+    """
+    Decide cuánto esperar entre frames según lo que se está mostrando.
+
+    Durante la carrera se mantienen los FPS completos; el menú solo
+    necesita un frame por tono del título; las pantallas quietas duermen
+    en pygame.event.wait hasta que llega un evento. Sin foco o con la
+    ventana minimizada se baja a UNFOCUSED_FPS. Además mide el CPU y el
+    tiempo real de cada estado para comparar el consumo.
+    """
+    
+    def __init__(self, clock):
+        """
+        Inicializa el ritmo con la ventana enfocada
         
-        # Sistema de pieles
-        self.skins = CAR_SKINS if self.player_num == 1 else CAR_SKINS_P2
-        self.current_skin = 0
-        self.unlocked_skins = [0]  # Piel 0 siempre desbloqueada
-        self.new_skin_unlocked = False
-        self.skin_notification = ""
+        Args:
+            clock: pygame.time.Clock del juego
+        """
+        self.clock = clock
+        self.focused = True
+        self.minimized = False
+        
+        # Estado -> [frames, segundos de CPU, segundos reales]
+        self.usage = {}
+        self.last_cpu = time.process_time()
+        self.last_wall = time.perf_counter()
     
-    # ========================================
-    # MÉTODOS DE CÁLCULO DE POSICIÓN
-    # ========================================
     
-    def get_lane_x(self, lane):
-        """Obtiene la posición X de un carril específico"""
-        lane_width = CANVAS_WIDTH // LANES
-        return lane * lane_width + (lane_width - PLAYER_WIDTH) // 2
+    def handle_window_event(self, event):
+        """Actualiza el foco y la minimización con los eventos de ventana"""
+        if event.type == pygame.WINDOWFOCUSLOST:
+            self.focused = False
+        elif event.type == pygame.WINDOWFOCUSGAINED:
+            self.focused = True
+        elif event.type == pygame.WINDOWMINIMIZED:
+            self.minimized = True
+        elif event.type == pygame.WINDOWRESTORED:
+            self.minimized = False
     
     
-    def get_current_lane(self):
-        """Obtiene el carril actual del jugador"""
-        lane_width = CANVAS_WIDTH // LANES
-        return int(self.x // lane_width)
+    def get_rate(self, state):
+        """
+        Obtiene los FPS objetivo de un estado
+        
+        Returns:
+            FPS, o None si no hay nada animado y basta con esperar un evento
+        """
+        if state == 'game':
+            rate = FPS
+        elif state == 'menu' and not self.minimized:
+            rate = MENU_FPS
+        else:
+            return None
+        
+        if not self.focused or self.minimized:
+            rate = min(rate, UNFOCUSED_FPS)
+        return rate
     
     
-    # ========================================
-    # MÉTODOS DE MOVIMIENTO
-    # ========================================
+    def wait(self, state):
+        """
+        Espera hasta el próximo frame y registra el consumo del frame actual
+        
+        Returns:
+            Evento que despertó la espera (va antes que los de la cola), o None
+        """
+        rate = self.get_rate(state)
+        event = None
+        
+        if rate is None:
+            # Solo se duerme con la cola vacía; el evento no se vuelve a
+            # encolar, porque quedaría detrás de los que llegan después
+            if not pygame.event.peek():
+                event = pygame.event.wait(IDLE_WAIT_MS)
+                if event.type == pygame.NOEVENT:
+                    event = None
+            self.clock.tick()
+        else:
+            self.clock.tick(rate)
+        
+        self._record(state)
+        return event
     
-    def move_left(self):
-        """Mueve el jugador al carril izquierdo"""
-        current_lane = self.get_current_lane()
-        if current_lane > 0:
-            self.x = self.get_lane_x(current_lane - 1)
     
+    def _record(self, state):
+        """Suma el CPU y el tiempo real del frame al estado"""
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        
+        usage = self.usage.setdefault(state, [0, 0.0, 0.0])
+        usage[0] += 1
+        usage[1] += cpu - self.last_cpu
+        usage[2] += wall - self.last_wall
+        
+        self.last_cpu = cpu
+        self.last_wall = wall
     
-    def move_right(self):
-        """Mueve el jugador al carril derecho"""
-        current_lane = self.get_current_lane()
-        if current_lane < LANES - 1:
-            self.x = self.get_lane_x(current_lane + 1)
     
+    def get_stats(self):
+        """Obtiene frames, FPS medios y porcentaje de CPU de cada estado"""
+        return {
+            state: {
+                'frames': frames,
+                'fps': frames / wall if wall else 0.0,
+                'cpu_percent': 100 * cpu / wall if wall else 0.0
+            }
+            for state, (frames, cpu, wall) in self.usage.items()
+        }
     
-    # ========================================
-    # MÉTODOS DE GESTIÓN DE ENEMIGOS
-    # ========================================
     
-    def spawn_enemy(self):
-        """Genera un enemigo nuevo según la frecuencia del nivel actual"""
-        current_level = LEVELS[self.level]
+    def print_report(self):
+        """Imprime el consumo de CPU de cada estado"""
+        print("📊 CPU por estado:")
+        for state, stats in self.get_stats().items():
+            print(f"   - {state}: {stats['cpu_percent']:.1f}% CPU a {stats['fps']:.1f} FPS "
+                  f"({stats['frames']} frames)")
+
+
+# ============================================
+# MARCADOR (HUD)
+# ============================================
+
+# Franja del marcador: el fondo verde y, debajo, la línea de la piel
+HUD_HEIGHT = 155
+HUD_BANNER_HEIGHT = 110
+HUD_FIELD_WIDTH = 240
+HUD_LINE_SPACING = 28
+
+
+class HUD:
+    """
+    Marcador de la carrera dibujado en su propia capa.
+
+    Cada jugador tiene cinco campos (jugador, puntos, nivel, velocidad y
+    piel) en posiciones fijas. Se recuerda el último valor dibujado de
+    cada campo y solo se vuelve a renderizar el texto de los que cambiaron;
+    el resto del frame es un blit de la capa.
+    """
+    
+    def __init__(self, font, text_cache):
+        """
+        Inicializa el marcador sin capa
         
-        if (self.frame_count % current_level['enemy_frequency'] == 0 and 
-            len(self.enemies) < current_level['max_enemies']):
-            
-            lane = random.randint(0, LANES - 1)
-            enemy_id = time.time() + random.random()
-            
-            self.enemies.append({
-                'x': self.get_lane_x(lane),
-                'y': -ENEMY_HEIGHT,
-                'id': enemy_id
-            })
-    
-    def update_enemies(self):
-        """Actualiza la posición de los enemigos y verifica colisiones"""
-        for i in range(len(self.enemies) - 1, -1, -1):
-            enemy = self.enemies[i]
-            enemy['y'] += self.speed
-            
-            # Verificar si el jugador adelantó al enemigo
-            if self._check_enemy_passed(enemy):
-                self._handle_enemy_passed(enemy)
-            
-            # Verificar colisión
-            if self.check_collision(enemy):
-                self.alive = False
-                return True  # Retorna True si hay colisión
-            
-            # Eliminar enemigos fuera de pantalla
-            if self._is_enemy_offscreen(enemy):
-                self._remove_enemy(i, enemy)
+        Args:
+            font: Fuente de los campos
+            text_cache: TextCache donde se renderizan los textos
+        """
+        self.font = font
+        self.text_cache = text_cache
+        self.layer = None
+        self.background = None
+        self.values = {}
+        self.player_count = 0
+    
+    
+    def reset(self):
+        """Descarta la capa (cambio de modo de video)"""
+        self.layer = None
+        self.background = None
+        self.values.clear()
+    
+    
+    def get_field_rect(self, index, line):
+        """Obtiene el rect fijo de un campo del jugador en la posición index"""
+        x = 60 if index == 0 else SCREEN_WIDTH - 300
+        y = 25 + line * HUD_LINE_SPACING
+        height = min(self.font.get_linesize() + 2, HUD_HEIGHT - y)
+        return pygame.Rect(x, y, HUD_FIELD_WIDTH, height)
+    
+    
+    def get_regions(self, players):
+        """Obtiene los pares (rect, valor) de cada campo, para las regiones modificadas"""
+        return [(self.get_field_rect(i, line), value)
+                for i, player in enumerate(players)
+                for line, value in enumerate(self._get_values(player))]
+    
+    
+    def update(self, players):
+        """
+        Renderiza de nuevo los campos que cambiaron desde el último frame
+        
+        Qué se presenta en pantalla lo decide el DirtyRectTracker con
+        get_regions; aquí solo se actualiza la capa.
+        """
+        if self.layer is None or len(players) != self.player_count:
+            self._init_layer()
+            self.player_count = len(players)
+        
+        for i, player in enumerate(players):
+            for line, value in enumerate(self._get_values(player)):
+                key = (i, line)
+                if key in self.values and self.values[key] == value:
+                    continue
+                
+                self.values[key] = value
+                self._draw_field(i, line, player)
+    
+    
+    def draw(self, surface):
+        """Dibuja el marcador en la parte superior de la pantalla"""
+        surface.blit(self.layer, (0, 0))
+    
+    
+    def _init_layer(self):
+        """Crea la capa y su fondo (franja verde sobre negro)"""
+        self.background = pygame.Surface((SCREEN_WIDTH, HUD_HEIGHT)).convert()
+        self.background.fill(BLACK)
+        pygame.draw.rect(self.background, DARK_GREEN, (0, 0, SCREEN_WIDTH, HUD_BANNER_HEIGHT))
+        
+        self.layer = self.background.copy()
+        self.values.clear()
+    
+    
+    def _get_values(self, player):
+        """Valores crudos de los campos de un jugador, en orden de línea"""
+        return (player.player_num, player.score, player.level,
+                player.speed_multiplier, player.current_skin)
+    
+    
+    def _draw_field(self, index, line, player):
+        """Borra un campo con el fondo y dibuja su texto actual"""
+        if line == 0:
+            text, color = f"JUGADOR {player.player_num}", GREEN
+        elif line == 1:
+            text, color = f"Puntos: {player.score}", GREEN
+        elif line == 2:
+            text, color = f"Nivel: {LEVELS[player.level]['name']}", GREEN
+        elif line == 3:
+            text, color = f"Velocidad: {player.speed_multiplier:.1f}x", GREEN
+        else:
+            skin = player.skins[player.current_skin]
+            text, color = f"Skin: {skin['name']}", skin['body']
+        
+        rect = self.get_field_rect(index, line)
+        self.layer.blit(self.background, rect, rect)
+        
+        self.layer.set_clip(rect)
+        self.layer.blit(self.text_cache.render(self.font, text, color), rect.topleft)
+        self.layer.set_clip(None)
+
+
+# ============================================
+# PERFILADOR DE FRAMES
+# ============================================
+
+class FrameProfiler:
+    """
+    Mide cuánto tarda cada fase del loop principal.
+
+    Game.run marca el fin de cada fase (eventos, actualización, render,
+    presentación) con lap(); el render también se separa por escena y
+    por canvas de jugador. Se guardan los últimos PROFILER_WINDOW frames
+    y se muestran p50/p95/p99 y el peor tiempo de cada fase, más los
+    frames perdidos (más lentos que su presupuesto). Solo mide mientras
+    el overlay está visible o hay un archivo de log.
+    """
+    
+    def __init__(self, font, text_cache, writer, log_path=None):
+        """
+        Inicializa el perfilador apagado
+        
+        Args:
+            font: Fuente del overlay
+            text_cache: TextCache donde se renderizan los textos
+            writer: BackgroundWriter que escribe el log fuera del frame
+            log_path: Archivo JSONL donde se agrega un resumen por ventana
+        """
+        self.font = font
+        self.text_cache = text_cache
+        self.writer = writer
+        self.log_path = log_path
+        self.visible = False
+        self.enabled = log_path is not None
+        
+        self.samples = {}
+        self.dropped = deque(maxlen=PROFILER_WINDOW)
+        self.dropped_total = 0
+        self.frames = 0
+        self.stats = {}
+        self.version = 0
+        self.surface = None
         
-        return False
+        self.frame_start = None
+        self.mark = 0.0
+        self.budget = None
     
     
-    def _check_enemy_passed(self, enemy):
-        """Verifica si el jugador adelantó al enemigo"""
-        return (enemy['y'] > self.y + PLAYER_HEIGHT and 
-                enemy['id'] not in self.passed_enemies)
+    def reset(self):
+        """Descarta la superficie del overlay (cambio de modo de video)"""
+        self.surface = None
     
     
-    def _handle_enemy_passed(self, enemy):
-        """Maneja cuando un enemigo es adelantado"""
-        self.passed_enemies.add(enemy['id'])
-        self.add_score(POINTS_PER_CAR)
+    def toggle(self):
+        """Muestra u oculta el overlay"""
+        self.visible = not self.visible
+        self.enabled = self.visible or self.log_path is not None
+        self.frame_start = None
     
     
-    def _is_enemy_offscreen(self, enemy):
-        """Verifica si el enemigo está fuera de pantalla"""
-        return enemy['y'] > CANVAS_HEIGHT
+    def begin_frame(self, rate):
+        """
+        Empieza a medir un frame
+        
+        Args:
+            rate: FPS objetivo del frame (None = sin presupuesto)
+        """
+        if not self.enabled:
+            return
+        
+        now = time.perf_counter()
+        if self.frame_start is not None and self.budget is not None:
+            is_dropped = now - self.frame_start > self.budget * DROPPED_FRAME_FACTOR
+            self.dropped.append(is_dropped)
+            self.dropped_total += is_dropped
+        
+        self.frame_start = self.mark = now
+        self.budget = 1 / rate if rate else None
     
     
-    def _remove_enemy(self, index, enemy):
-        """Elimina un enemigo de la lista"""
-        if enemy['id'] in self.passed_enemies:
-            self.passed_enemies.remove(enemy['id'])
-        self.enemies.pop(index)
+    def lap(self, *names):
+        """Registra el tiempo desde la marca anterior bajo uno o más nombres"""
+        if not self.enabled:
+            return
+        
+        now = time.perf_counter()
+        for name in names:
+            self.add(name, now - self.mark)
+        self.mark = now
+    
     
+    def add(self, name, seconds):
+        """Registra una medición de una fase"""
+        if not self.enabled:
+            return
+        
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=PROFILER_WINDOW)
+        samples.append(seconds)
+    
+    
+    def end_frame(self):
+        """Termina el frame (sin contar la espera) y actualiza las estadísticas"""
+        if not self.enabled or self.frame_start is None:
+            return
+        
+        self.add('frame', time.perf_counter() - self.frame_start)
+        self.frames += 1
+        
+        if self.frames % PROFILER_REFRESH == 0:
+            self._refresh()
+        if self.log_path and self.frames % PROFILER_WINDOW == 0:
+            self._write_log()
+    
+    
+    def _refresh(self):
+        """Recalcula los percentiles de cada fase (en milisegundos)"""
+        self.stats = {}
+        for name, samples in self.samples.items():
+            values = sorted(samples)
+            last = len(values) - 1
+            self.stats[name] = {
+                'p50': values[int(last * 0.50)] * 1000,
+                'p95': values[int(last * 0.95)] * 1000,
+                'p99': values[int(last * 0.99)] * 1000,
+                'max': values[last] * 1000
+            }
+        
+        self.version += 1
+        self.surface = None
+    
+    
+    def _write_log(self):
+        """Agrega al log una línea JSON con las estadísticas de la ventana"""
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'frames': self.frames,
+            'dropped': sum(self.dropped),
+            'dropped_total': self.dropped_total,
+            'phases': {name: {key: round(value, 3) for key, value in stats.items()}
+                       for name, stats in self.stats.items()}
+        }
+        self.writer.append(self.log_path, json.dumps(entry) + '\n')
+    
+    
+    def get_rect(self):
+        """Rect del overlay en la pantalla"""
+        height = (len(self.stats) + 2) * self.font.get_linesize() + 10
+        return pygame.Rect(8, SCREEN_HEIGHT - height - 8, 330, height)
+    
+    
+    def draw(self, surface):
+        """Dibuja el overlay con la tabla de tiempos"""
+        if self.surface is None:
+            self.surface = self._render()
+        surface.blit(self.surface, self.get_rect())
+    
+    
+    def _render(self):
+        """Renderiza la tabla de tiempos en su propia superficie"""
+        rect = self.get_rect()
+        overlay = pygame.Surface(rect.size).convert()
+        overlay.fill(BLACK)
+        pygame.draw.rect(overlay, GREEN, overlay.get_rect(), 1)
+        
+        line_height = self.font.get_linesize()
+        columns = (5, 130, 180, 230, 280)
+        rows = [('ms', 'p50', 'p95', 'p99', 'max')]
+        rows += [(name,) + tuple(f"{stats[key]:.2f}" for key in ('p50', 'p95', 'p99', 'max'))
+                 for name, stats in self.stats.items()]
+        rows.append((f"Perdidos: {sum(self.dropped)}/{len(self.dropped)} "
+                     f"(total {self.dropped_total})",))
+        
+        for i, row in enumerate(rows):
+            color = YELLOW if i == 0 else GREEN
+            for x, text in zip(columns, row):
+                overlay.blit(self.text_cache.render(self.font, text, color), (x, 5 + i * line_height))
+        
+        return overlay
+
+
+# ============================================
+# CAPTURA DE CPROFILE
+# ============================================
+
+class ProfileCapture:
+    """
+    Captura de cProfile que se enciende y apaga con el juego corriendo.
+
+    Al detenerse guarda el perfil completo como perfil_<fecha>.prof (para
+    pstats o snakeviz) y un resumen de texto con las PROFILE_TOP funciones
+    de mayor tiempo acumulado y de mayor tiempo propio. La fecha lleva
+    microsegundos, así dos capturas en el mismo segundo no se pisan. Los
+    dos archivos se generan y escriben en el hilo del BackgroundWriter.
+    """
+    
+    def __init__(self, writer, directory=PROFILE_DIR, top=PROFILE_TOP):
+        """
+        Inicializa la captura detenida
+        
+        Args:
+            writer: BackgroundWriter que genera y escribe los archivos
+            directory: Carpeta donde se guardan los perfiles
+            top: Funciones en el resumen
+        """
+        self.writer = writer
+        self.directory = directory
+        self.top = top
+        self.profile = None
+    
+    
+    @property
+    def active(self):
+        """Indica si hay una captura en curso"""
+        return self.profile is not None
+    
+    
+    def start(self):
+        """Empieza una captura nueva"""
+        if self.active:
+            return
+        
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Ya hay otro perfilador activo (por ejemplo python -m cProfile)
+            print("⚠️ No se pudo iniciar la captura: ya hay un perfilador activo")
+            return
+        
+        self.profile = profile
+        print("🔬 Captura de perfil iniciada")
+    
+    
+    def stop(self):
+        """
+        Detiene la captura y encola el perfil y su resumen
+        
+        Returns:
+            Ruta del archivo .prof, o None si no había captura
+        """
+        if not self.active:
+            return None
+        
+        profile = self.profile
+        profile.disable()
+        self.profile = None
+        
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"perfil_{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}")
+        self.writer.replace(base + '.prof', lambda: self._dump(profile))
+        self.writer.replace(base + '.txt', lambda: self._summarize(profile))
+        
+        print(f"🔬 Perfil en {base}.prof (resumen en {base}.txt)")
+        return base + '.prof'
+    
+    
+    def _dump(self, profile):
+        """Contenido del .prof, en el mismo formato que Profile.dump_stats"""
+        profile.create_stats()
+        return marshal.dumps(profile.stats)
+    
+    
+    def _summarize(self, profile):
+        """Resumen de texto con las funciones de más tiempo acumulado y propio"""
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream).strip_dirs()
+        stream.write("=== Tiempo acumulado ===\n")
+        stats.sort_stats('cumulative').print_stats(self.top)
+        stream.write("=== Tiempo propio ===\n")
+        stats.sort_stats('tottime').print_stats(self.top)
+        return stream.getvalue()
+    
+    
+    def toggle(self):
+        """Inicia o detiene la captura"""
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+
+# ============================================
+# CLASE PLAYER
+# ============================================
+
+class Player(Race):
+    """
+    Clase que representa a un jugador en el juego.
+    Las reglas de la carrera vienen de Race; aquí se agregan controles,
+    pieles y renderizado.
+    """
+    
+    def __init__(self, player_num, x_offset=0, seed=None):
+        """
+        Inicializa un jugador
+        
+        Args:
+            player_num: Número del jugador (1 o 2)
+            x_offset: Desplazamiento horizontal para modo multijugador
+            seed: Semilla del tráfico (None = aleatorio)
+        """
+        self.player_num = player_num
+        self.x_offset = x_offset
+        
+        # Posición, estadísticas y enemigos
+        super().__init__(seed)
+        
+        # Controles y apariencia
+        self._init_controls_and_appearance()
     
-    def check_collision(self, enemy):
-        """Verifica si hay colisión entre el jugador y un enemigo"""
-        return (self.x < enemy['x'] + ENEMY_WIDTH and
-                self.x + PLAYER_WIDTH > enemy['x'] and
-                self.y < enemy['y'] + ENEMY_HEIGHT and
-                self.y + PLAYER_HEIGHT > enemy['y'])
     
+    def _init_controls_and_appearance(self):
+        """Inicializa controles y apariencia del jugador"""
+        self.controls = PLAYER1_CONTROLS if self.player_num == 1 else PLAYER2_CONTROLS
+        self.color = GREEN if self.player_num == 1 else YELLOW
+        
+        # Sistema de pieles
+        self.skins = CAR_SKINS if self.player_num == 1 else CAR_SKINS_P2
+        self.current_skin = 0
+        self.unlocked_skins = [0]  # Piel 0 siempre desbloqueada
+        self.new_skin_unlocked = False
+        self.skin_notification = ""
+        
+        # Generador propio para no alterar el tráfico al desbloquear pieles,
+        # derivado de la semilla para no repetir los sorteos de carril
+        self.skin_rng = random.Random(None if self.seed is None else f"{self.seed}:skins")
     
     # ========================================
-    # MÉTODOS DE PUNTUACIÓN Y NIVELES
+    # MÉTODOS DE PUNTUACIÓN Y PIELES
     # ========================================
     
     def add_score(self, points):
-        """Añade puntos y actualiza la velocidad y nivel"""
+        """Añade puntos y verifica el desbloqueo de pieles"""
         old_score = self.score
-        self.score += points
+        super().add_score(points)
         
         # Verificar si se desbloqueó una nueva piel
         self._check_skin_unlock(old_score)
-        
-        self._update_speed()
-        self._update_level()
     
     
     def _check_skin_unlock(self, old_score):
@@ -413,105 +1200,59 @@ class Player:
     
     def _unlock_random_skin(self):
         """Desbloquea una piel aleatoria que aún no esté desbloqueada"""
-        import random
-        
         # Encontrar pieles bloqueadas
         locked_skins = [i for i in range(len(self.skins)) 
                        if i not in self.unlocked_skins and self.skins[i]['unlock_score'] > 0]
         
         if locked_skins:
-            new_skin = random.choice(locked_skins)
+            new_skin = self.skin_rng.choice(locked_skins)
             self.unlocked_skins.append(new_skin)
             self.current_skin = new_skin
             self.new_skin_unlocked = True
             self.skin_notification = f"¡NUEVA PIEL: {self.skins[new_skin]['name']}!"
     
-    
-    def _update_speed(self):
-        """Actualiza la velocidad según la puntuación"""
-        new_speed_multiplier = 1 + (self.score // SPEED_UP_EVERY) * SPEED_INCREMENT
-        
-        if new_speed_multiplier > self.speed_multiplier:
-            self.speed_multiplier = new_speed_multiplier
-            self.speed = BASE_SPEED * self.speed_multiplier
-    
-    
-    def _update_level(self):
-        """Actualiza el nivel según la puntuación"""
-        if self.score >= 100 and self.level < 2:
-            self.level = 2
-        elif self.score >= 50 and self.level < 1:
-            self.level = 1
-    
     # ========================================
     # MÉTODOS DE RENDERIZADO
     # ========================================
     
-    def draw_road(self, surface):
+    def draw_road(self, surface, road_offset=None):
         """Dibuja la carretera con las líneas de carril"""
-        # Fondo de la carretera
-        pygame.draw.rect(surface, GRAY, (self.x_offset, 0, CANVAS_WIDTH, CANVAS_HEIGHT))
-        
-        # Líneas de carril
-        self._draw_lane_lines(surface)
+        if road_offset is None:
+            road_offset = self.road_offset
         
-        # Actualizar desplazamiento de la carretera
-        self.road_offset += self.speed
-    
-    
-    def _draw_lane_lines(self, surface):
-        """Dibuja las líneas de los carriles"""
-        lane_width = CANVAS_WIDTH // LANES
-        
-        for i in range(1, LANES):
-            x = self.x_offset + i * lane_width
-            
-            # Líneas discontinuas animadas
-            for y in range(int(self.road_offset % 40) - 40, CANVAS_HEIGHT, 40):
-                pygame.draw.line(surface, WHITE, (x, y), (x, y + 20), 2)
+        road_texture.draw(surface, self.x_offset, road_offset)
     
     
     def draw_car(self, surface, x, y, color):
         """Dibuja un auto en la posición especificada"""
-        x += self.x_offset
-        
         # Si es el jugador, usar la piel actual
         if color == self.color:
-            skin = self.skins[self.current_skin]
-            body_color = skin['body']
-            window_color = skin['window']
-            wheel_color = skin['wheels']
+            sprite = car_sprites.get_skin(self.skins[self.current_skin])
         else:
             # Para enemigos, usar colores normales
-            body_color = color
-            window_color = CYAN
-            wheel_color = BLACK
-        
-        # Cuerpo del auto
-        pygame.draw.rect(surface, body_color, (x + 5, y, 30, 50))
+            sprite = car_sprites.get(color, CYAN, BLACK)
         
-        # Ventana
-        pygame.draw.rect(surface, window_color, (x + 8, y + 10, 24, 15))
-        
-        # Ruedas
-        self._draw_car_wheels(surface, x, y, wheel_color)
-    
+        surface.blit(sprite, (x + self.x_offset, y))
     
-    def _draw_car_wheels(self, surface, x, y, wheel_color=BLACK):
-        """Dibuja las ruedas del auto"""
-        pygame.draw.rect(surface, wheel_color, (x, y + 5, 8, 12))
-        pygame.draw.rect(surface, wheel_color, (x + 32, y + 5, 8, 12))
-        pygame.draw.rect(surface, wheel_color, (x, y + 33, 8, 12))
-        pygame.draw.rect(surface, wheel_color, (x + 32, y + 33, 8, 12))
     
-    
-    def draw(self, surface):
-        """Dibuja todos los elementos del jugador en la pantalla"""
-        self.draw_road(surface)
+    def draw(self, surface, alpha=1.0):
+        """
+        Dibuja todos los elementos del jugador en la pantalla
+        
+        Args:
+            surface: Superficie donde dibujar
+            alpha: Fracción (0 a 1) del frame de simulación en curso, para
+                   interpolar entre la posición anterior y la actual
+        """
+        # Todo lo que baja se movió frame_distance en el último frame
+        lag = self.frame_distance * (alpha - 1)
         
-        # Dibujar enemigos
-        for enemy in self.enemies:
-            self.draw_car(surface, enemy['x'], enemy['y'], RED)
+        self.draw_road(surface, self.road_offset + lag)
+        
+        # Dibujar enemigos en un solo lote de blits
+        enemy_sprite = car_sprites.get(*ENEMY_COLORS)
+        surface.blits([(enemy_sprite, (self.x_offset + enemy.x, enemy.y + lag))
+                       for enemy in self.enemies], False)
         
         # Dibujar jugador si está vivo
         if self.alive:
@@ -538,22 +1279,6 @@ class Player:
         
         # Texto
         surface.blit(text_surface, text_rect)
-    
-    
-    # ========================================
-    # MÉTODO DE ACTUALIZACIÓN PRINCIPAL
-    # ========================================
-    
-    def update(self):
-        """Actualiza el estado del jugador"""
-        if not self.alive:
-            return False
-        
-        self.frame_count += 1
-        self.spawn_enemy()
-        collision = self.update_enemies()
-        
-        return not collision  # Retorna True si no hay colisión
 
 
 # ============================================
@@ -566,34 +1291,72 @@ class Game:
     Maneja el loop principal, menús, controles y renderizado de pantallas.
     """
     
-    def __init__(self):
-        """Inicializa el juego"""
+    def __init__(self, dirty_rects=False, frame_log=None, profile=False,
+                 profile_dir=PROFILE_DIR, scores_db=None):
+        """
+        Inicializa el juego
+        
+        Args:
+            dirty_rects: Redibujar y presentar solo las regiones que cambian
+                         (para pantallas renderizadas por software)
+            frame_log: Archivo JSONL para los tiempos por frame (None = sin log)
+            profile: Capturar con cProfile desde el inicio del loop
+            profile_dir: Carpeta de las capturas de cProfile (F4)
+            scores_db: Base SQLite para el historial de puntuaciones
+                       (None = diario JSONL)
+        """
         # Inicializar Pygame
         pygame.init()
         pygame.mixer.init()
         
         # Configuración de pantalla
-        self._init_display()
+        self._init_display(dirty_rects)
         
         # Fuentes
         self._init_fonts()
         
+        # Escrituras a disco fuera del hilo del juego
+        self.writer = BackgroundWriter()
+        
+        # Tiempos por fase de cada frame (F3 muestra el overlay)
+        self.profiler = FrameProfiler(self.font_profiler, self.text_cache, self.writer, frame_log)
+        
+        # Captura de cProfile (F4 o --profile)
+        self.profile_capture = ProfileCapture(self.writer, profile_dir)
+        self.profile_on_start = profile
+        
         # Estado del juego
         self._init_game_state()
         
+        # Posición de botones y tarjetas
+        self._init_layout()
+        
         # Sonidos
         self.load_sounds()
         
-        # Archivo de puntuaciones
+        # Puntuaciones: diario servido desde memoria, o SQLite con --scores-db
         self.scores_file = 'scores.json'
+        if scores_db:
+            self.leaderboard = SQLiteLeaderboard(scores_db, scores_file=self.scores_file,
+                                                 writer=self.writer)
+        else:
+            self.leaderboard = Leaderboard(self.scores_file, writer=self.writer)
     
     
-    def _init_display(self):
+    def _init_display(self, dirty_rects=False):
         """Inicializa la pantalla del juego"""
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("🏁 CARRERA RETRO 8-BIT 🏁")
         self.clock = pygame.time.Clock()
+        self.pacer = FramePacer(self.clock)
         self.fullscreen = False
+        self.surfaces = SurfaceManager()
+        
+        # Regiones modificadas (None = flip() de la pantalla completa)
+        self.dirty_rects = DirtyRectTracker() if dirty_rects else None
+        
+        # Pre-renderizar los autos en el formato de la pantalla
+        car_sprites.build_all()
     
     
     def _init_fonts(self):
@@ -602,6 +1365,13 @@ class Game:
         self.font_medium = pygame.font.Font(None, 48)
         self.font_small = pygame.font.Font(None, 32)
         self.font_tiny = pygame.font.Font(None, 24)
+        self.font_profiler = pygame.font.Font(None, 20)
+        
+        # Textos ya renderizados, para no llamar a font.render en cada frame
+        self.text_cache = TextCache()
+        
+        # Marcador de la carrera (solo redibuja los campos que cambian)
+        self.hud = HUD(self.font_tiny, self.text_cache)
     
     
     def _init_game_state(self):
@@ -610,8 +1380,65 @@ class Game:
         self.game_mode = 'single'  # 'single' o 'multi'
         self.players = []
         self.selected_player = 1  # Para la tienda
+        self.race_seed = None  # Semilla del tráfico de la última partida
+        self.scores_page = 0  # Página de la pantalla de puntuaciones
+        self.scores_page_data = None  # (puntuaciones, hay siguiente) de esa página
+        self.final_stats = None  # Posición de la última partida en el historial
         self.total_score_p1 = 0
         self.total_score_p2 = 0
+        self.sim_accumulator = 0.0  # Tiempo pendiente de simular (segundos)
+    
+    
+    def _init_layout(self):
+        """Calcula una sola vez los rects de botones y tarjetas de las pantallas"""
+        # Menú principal: (rect, acción, texto)
+        menu_buttons = [
+            ("1 JUGADOR", 'single'),
+            ("2 JUGADORES", 'multi'),
+            ("TIENDA DE PIELES", 'shop'),
+            ("TOP 3 PUNTAJES", 'scores'),
+            ("SALIR", 'quit')
+        ]
+        button_y = 180
+        button_height = 55
+        button_spacing = 70
+        self.menu_buttons = [
+            (pygame.Rect(SCREEN_WIDTH // 2 - 200, button_y + i * button_spacing, 400, button_height),
+             action, text)
+            for i, (text, action) in enumerate(menu_buttons)
+        ]
+        
+        # Volver (puntuaciones y tienda) y selector de jugador de la tienda
+        self.back_button = pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT - 120, 300, 60)
+        
+        # Páginas de la pantalla de puntuaciones: (rect, paso, texto)
+        self.page_buttons = [
+            (pygame.Rect(SCREEN_WIDTH // 2 - 200, SCREEN_HEIGHT - 200, 80, 50), -1, "<"),
+            (pygame.Rect(SCREEN_WIDTH // 2 + 120, SCREEN_HEIGHT - 200, 80, 50), 1, ">")
+        ]
+        self.player_button_1 = pygame.Rect(SCREEN_WIDTH // 2 - 220, 100, 200, 50)
+        self.player_button_2 = pygame.Rect(SCREEN_WIDTH // 2 + 20, 100, 200, 50)
+        
+        # Tarjetas de la tienda
+        start_x = 100
+        start_y = 200
+        skin_width = 150
+        skin_height = 200
+        spacing = 30
+        skins_per_row = 4
+        self.skin_card_rects = [
+            pygame.Rect(start_x + (i % skins_per_row) * (skin_width + spacing),
+                        start_y + (i // skins_per_row) * (skin_height + spacing),
+                        skin_width, skin_height)
+            for i in range(max(len(CAR_SKINS), len(CAR_SKINS_P2)))
+        ]
+        
+        # Game over
+        button_y = SCREEN_HEIGHT - 180
+        self.game_over_buttons = [
+            (pygame.Rect(SCREEN_WIDTH // 2 - 200, button_y, 400, 60), 'menu', "MENÚ PRINCIPAL"),
+            (pygame.Rect(SCREEN_WIDTH // 2 - 200, button_y + 75, 400, 60), 'restart', "JUGAR DE NUEVO")
+        ]
     
     # ========================================
     # MÉTODOS DE AUDIO
@@ -670,7 +1497,7 @@ class Game:
     
     def draw_text(self, text, font, color, x, y, center=True):
         """Dibuja texto en la pantalla"""
-        text_surface = font.render(text, True, color)
+        text_surface = self.text_cache.render(font, text, color)
         text_rect = text_surface.get_rect()
         
         if center:
@@ -681,21 +1508,76 @@ class Game:
         self.screen.blit(text_surface, text_rect)
         return text_rect
     
+    # ========================================
+    # MÉTODOS DE CAPAS CACHEADAS
+    # ========================================
+    
+    def _get_cached_layer(self, name, key, draw, *args):
+        """
+        Obtiene una capa de pantalla completa, redibujándola solo si cambió su clave
+        
+        Args:
+            name: Nombre de la capa
+            key: Resumen de lo que muestra la capa (hover, puntos, jugador...)
+            draw: Función que dibuja la capa en self.screen
+            *args: Argumentos para draw
+        """
+        layer, valid = self.surfaces.get_layer(name, key)
+        if not valid:
+            # Mientras se dibuja, self.screen apunta a la capa
+            screen = self.screen
+            self.screen = layer
+            try:
+                draw(*args)
+            finally:
+                self.screen = screen
+        return layer
+    
+    
+    def _get_hovered(self, rects):
+        """Obtiene el índice del primer rect bajo el mouse, o None"""
+        mouse_pos = pygame.mouse.get_pos()
+        for i, rect in enumerate(rects):
+            if rect.collidepoint(mouse_pos):
+                return i
+        return None
+    
     # ========================================
     # MÉTODOS DE RENDERIZADO DE PANTALLAS
     # ========================================
     
     def draw_menu(self):
-        """Dibuja el menú principal"""
+        """Dibuja el menú principal desde su capa cacheada"""
+        alpha = self._get_title_alpha()
+        hovered = self._get_hovered([rect for rect, _, _ in self.menu_buttons])
+        
+        menu = self._get_cached_layer('menu', (alpha, hovered),
+                                      self._compose_menu, alpha, hovered)
+        self.screen.blit(menu, (0, 0))
+    
+    
+    def _compose_menu(self, alpha, hovered):
+        """Compone el menú: partes fijas, título con su brillo y botón bajo el mouse"""
+        background = self._get_cached_layer('menu_background', None, self._draw_menu_background)
+        self.screen.blit(background, (0, 0))
+        
+        # Título con efecto pulsante
+        self._draw_pulsing_title(alpha)
+        
+        # Efecto hover sobre el botón de la capa fija
+        if hovered is not None:
+            button_rect, _, text = self.menu_buttons[hovered]
+            self._draw_button(button_rect, text, True)
+    
+    
+    def _draw_menu_background(self):
+        """Dibuja las partes fijas del menú"""
         self.screen.fill(BLACK)
         
         # Fondo con efecto de gradiente
         self._draw_gradient_background()
         
-        # Título con efecto pulsante
-        self._draw_pulsing_title()
-        
-        # Botones del menú
+        # Botones del menú (sin hover)
         self._draw_menu_buttons()
         
         # Instrucciones
@@ -704,50 +1586,43 @@ class Game:
     
     def _draw_gradient_background(self):
         """Dibuja el fondo con efecto de gradiente"""
+        gradient = self._get_cached_layer('gradient', None, self._draw_gradient)
+        self.screen.blit(gradient, (0, 0))
+    
+    
+    def _draw_gradient(self):
+        """Dibuja las franjas del gradiente"""
         for i in range(0, SCREEN_HEIGHT, 20):
             color_val = int(51 * (1 - i / SCREEN_HEIGHT))
             pygame.draw.rect(self.screen, (0, color_val, 0), 
                            (0, i, SCREEN_WIDTH, 20))
     
     
-    def _draw_pulsing_title(self):
+    def _get_title_alpha(self):
+        """Brillo del título, cuantizado en TITLE_PULSE_STEPS tonos por ciclo"""
+        step = TITLE_PULSE_PERIOD // TITLE_PULSE_STEPS
+        ticks = pygame.time.get_ticks() % TITLE_PULSE_PERIOD
+        ticks -= ticks % step
+        half = TITLE_PULSE_PERIOD // 2
+        return int(255 * (0.7 + 0.3 * abs(ticks - half) / half))
+    
+    
+    def _draw_pulsing_title(self, alpha):
         """Dibuja el título con efecto pulsante"""
-        alpha = int(255 * (0.7 + 0.3 * abs(pygame.time.get_ticks() % 2000 - 1000) / 1000))
         title_color = (0, alpha, 0)
-        self.draw_text("🏁 CARRERA RETRO 🏁", self.font_large, title_color, 
-                      SCREEN_WIDTH // 2, 80)
+        self.title_rect = self.draw_text("🏁 CARRERA RETRO 🏁", self.font_large, title_color, 
+                                         SCREEN_WIDTH // 2, 80)
     
     
     def _draw_menu_buttons(self):
-        """Dibuja los botones del menú principal"""
-        button_y = 180
-        button_height = 55
-        button_spacing = 70
-        
-        mouse_pos = pygame.mouse.get_pos()
-        
-        buttons = [
-            ("1 JUGADOR", 'single'),
-            ("2 JUGADORES", 'multi'),
-            ("TIENDA DE PIELES", 'shop'),
-            ("TOP 3 PUNTAJES", 'scores'),
-            ("SALIR", 'quit')
-        ]
-        
-        self.menu_buttons = []
-        
-        for i, (text, action) in enumerate(buttons):
-            y = button_y + i * button_spacing
-            button_rect = pygame.Rect(SCREEN_WIDTH // 2 - 200, y, 400, button_height)
-            self.menu_buttons.append((button_rect, action))
-            
-            # Efecto hover
-            self._draw_button(button_rect, text, mouse_pos, button_height)
+        """Dibuja los botones del menú principal sin hover"""
+        for button_rect, _, text in self.menu_buttons:
+            self._draw_button(button_rect, text, False)
     
     
-    def _draw_button(self, button_rect, text, mouse_pos, button_height):
+    def _draw_button(self, button_rect, text, hovered):
         """Dibuja un botón individual con efecto hover"""
-        if button_rect.collidepoint(mouse_pos):
+        if hovered:
             pygame.draw.rect(self.screen, GREEN, button_rect)
             text_color = BLACK
             pygame.draw.rect(self.screen, GREEN, button_rect, 3)
@@ -780,31 +1655,63 @@ class Game:
                           SCREEN_WIDTH // 2, inst_y + 65 + i * 28)
     
     def draw_scores_screen(self):
-        """Dibuja la pantalla de puntuaciones"""
+        """Dibuja la pantalla de puntuaciones desde su capa cacheada"""
+        scores, has_next = self._get_scores_page()
+        page_buttons = self._get_page_buttons(has_next)
+        hovered = self._get_hovered([self.back_button] + [rect for rect, _, _ in page_buttons])
+        key = (self.scores_page, tuple(tuple(score.items()) for score in scores), has_next, hovered)
+        
+        layer = self._get_cached_layer('scores', key, self._draw_scores_layer, scores, has_next)
+        self.screen.blit(layer, (0, 0))
+    
+    
+    def _get_scores_page(self):
+        """Puntuaciones de la página actual; se leen solo al cambiar de página"""
+        if self.scores_page_data is None:
+            self.scores_page_data = self.leaderboard.get_page(self.scores_page, SCORES_PER_PAGE)
+        return self.scores_page_data
+    
+    
+    def _get_page_buttons(self, has_next):
+        """Botones de página visibles: anterior si no es la primera, siguiente si hay más"""
+        return [(rect, step, text) for rect, step, text in self.page_buttons
+                if (step < 0 and self.scores_page > 0) or (step > 0 and has_next)]
+    
+    
+    def _draw_scores_layer(self, scores, has_next):
+        """Dibuja la pantalla de puntuaciones completa"""
         self.screen.fill(BLACK)
         
         # Fondo
         self._draw_gradient_background()
         
-        # Título
-        self.draw_text("🏆 TOP 3 PUNTAJES 🏆", self.font_large, GREEN, 
+        # Título (con una sola página, el top de siempre)
+        page_buttons = self._get_page_buttons(has_next)
+        title = "🏆 MEJORES PUNTAJES 🏆" if page_buttons else "🏆 TOP 3 PUNTAJES 🏆"
+        self.draw_text(title, self.font_large, GREEN, 
                       SCREEN_WIDTH // 2, 80)
         
         # Mostrar puntuaciones
-        self._draw_top_scores()
+        self._draw_top_scores(scores, self.scores_page * SCORES_PER_PAGE + 1)
+        
+        # Navegación entre páginas
+        if page_buttons:
+            mouse_pos = pygame.mouse.get_pos()
+            for rect, _, text in page_buttons:
+                self._draw_button(rect, text, rect.collidepoint(mouse_pos))
+            self.draw_text(f"Página {self.scores_page + 1}", self.font_small, GREEN,
+                          SCREEN_WIDTH // 2, self.page_buttons[0][0].centery)
         
         # Botón volver
         self._draw_back_button()
     
     
-    def _draw_top_scores(self):
-        """Dibuja las mejores puntuaciones"""
-        scores = self.get_top_scores()
-        
+    def _draw_top_scores(self, scores, first_rank=1):
+        """Dibuja las mejores puntuaciones, numeradas desde first_rank"""
         if scores:
             y = 220
             for i, score in enumerate(scores):
-                text = f"{i + 1}. {score['name']} - {score['score']} puntos"
+                text = f"{first_rank + i}. {score['name']} - {score['score']} puntos"
                 self.draw_text(text, self.font_medium, GREEN, 
                               SCREEN_WIDTH // 2, y + i * 75)
         else:
@@ -815,8 +1722,7 @@ class Game:
     def _draw_back_button(self):
         """Dibuja el botón de volver"""
         mouse_pos = pygame.mouse.get_pos()
-        button_rect = pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT - 120, 300, 60)
-        self.back_button = button_rect
+        button_rect = self.back_button
         
         if button_rect.collidepoint(mouse_pos):
             pygame.draw.rect(self.screen, GREEN, button_rect)
@@ -831,7 +1737,21 @@ class Game:
     
     
     def draw_shop_screen(self):
-        """Dibuja la pantalla de tienda de pieles"""
+        """Dibuja la pantalla de tienda de pieles desde su capa cacheada"""
+        total_score = self.total_score_p1 if self.selected_player == 1 else self.total_score_p2
+        unlocked_count = self._get_unlocked_count(total_score)
+        
+        # Solo las tarjetas desbloqueadas cambian con el hover
+        hovered = self._get_hovered([self.back_button, self.player_button_1, self.player_button_2] +
+                                    self.skin_card_rects[:unlocked_count])
+        key = (self.selected_player, total_score, hovered)
+        
+        layer = self._get_cached_layer('shop', key, self._draw_shop_layer, total_score)
+        self.screen.blit(layer, (0, 0))
+    
+    
+    def _draw_shop_layer(self, total_score):
+        """Dibuja la tienda de pieles completa"""
         self.screen.fill(BLACK)
         
         # Fondo
@@ -845,7 +1765,6 @@ class Game:
         self._draw_player_selector()
         
         # Mostrar puntos acumulados
-        total_score = self.total_score_p1 if self.selected_player == 1 else self.total_score_p2
         self.draw_text(f"Puntos Totales: {total_score}", self.font_small, YELLOW, 
                       SCREEN_WIDTH // 2, 140)
         
@@ -861,8 +1780,7 @@ class Game:
         mouse_pos = pygame.mouse.get_pos()
         
         # Botón Jugador 1
-        button_p1 = pygame.Rect(SCREEN_WIDTH // 2 - 220, 100, 200, 50)
-        self.player_button_1 = button_p1
+        button_p1 = self.player_button_1
         
         if self.selected_player == 1:
             pygame.draw.rect(self.screen, GREEN, button_p1)
@@ -879,8 +1797,7 @@ class Game:
                       SCREEN_WIDTH // 2 - 120, 125)
         
         # Botón Jugador 2
-        button_p2 = pygame.Rect(SCREEN_WIDTH // 2 + 20, 100, 200, 50)
-        self.player_button_2 = button_p2
+        button_p2 = self.player_button_2
         
         if self.selected_player == 2:
             pygame.draw.rect(self.screen, YELLOW, button_p2)
@@ -897,37 +1814,31 @@ class Game:
                       SCREEN_WIDTH // 2 + 120, 125)
     
     
+    def _get_unlocked_count(self, total_score):
+        """Calcula cuántas pieles están desbloqueadas con los puntos totales"""
+        unlocked_count = 1  # Siempre tienen la piel clásica
+        if total_score >= 500:
+            unlocked_count = min(4, 1 + (total_score // 500))  # Máximo 3 pieles adicionales
+        return unlocked_count
+    
+    
     def _draw_skins_grid(self):
         """Dibuja la cuadrícula de pieles disponibles"""
         skins = CAR_SKINS if self.selected_player == 1 else CAR_SKINS_P2
         total_score = self.total_score_p1 if self.selected_player == 1 else self.total_score_p2
-        
-        # Calcular cuántas pieles están desbloqueadas
-        unlocked_count = 1  # Siempre tienen la piel clásica
-        if total_score >= 500:
-            unlocked_count = min(4, 1 + (total_score // 500))  # Máximo 3 pieles adicionales
-        
-        start_x = 100
-        start_y = 200
-        skin_width = 150
-        skin_height = 200
-        spacing = 30
-        skins_per_row = 4
+        unlocked_count = self._get_unlocked_count(total_score)
         
         self.skin_buttons = []
         
         for i, skin in enumerate(skins):
-            row = i // skins_per_row
-            col = i % skins_per_row
-            
-            x = start_x + col * (skin_width + spacing)
-            y = start_y + row * (skin_height + spacing)
+            card_rect = self.skin_card_rects[i]
             
             # Verificar si está desbloqueada
             is_unlocked = i < unlocked_count
             
             # Dibujar tarjeta de piel
-            self._draw_skin_card(x, y, skin_width, skin_height, skin, is_unlocked, i)
+            self._draw_skin_card(card_rect.x, card_rect.y, card_rect.width, card_rect.height,
+                                 skin, is_unlocked, i)
     
     
     def _draw_skin_card(self, x, y, width, height, skin, is_unlocked, index):
@@ -975,34 +1886,12 @@ class Game:
     
     def _draw_mini_car(self, x, y, skin, is_unlocked):
         """Dibuja un mini carro de muestra"""
-        scale = 1.5
-        
         if is_unlocked:
-            body_color = skin['body']
-            window_color = skin['window']
-            wheel_color = skin['wheels']
+            sprite = car_sprites.get_skin(skin, 'mini')
         else:
-            body_color = GRAY
-            window_color = DARK_GRAY
-            wheel_color = BLACK
-        
-        # Cuerpo
-        pygame.draw.rect(self.screen, body_color, 
-                        (x + 7*scale, y, 45*scale, 75*scale))
-        
-        # Ventana
-        pygame.draw.rect(self.screen, window_color, 
-                        (x + 12*scale, y + 15*scale, 36*scale, 22*scale))
-        
-        # Ruedas
-        pygame.draw.rect(self.screen, wheel_color, 
-                        (x, y + 7*scale, 12*scale, 18*scale))
-        pygame.draw.rect(self.screen, wheel_color, 
-                        (x + 48*scale, y + 7*scale, 12*scale, 18*scale))
-        pygame.draw.rect(self.screen, wheel_color, 
-                        (x, y + 50*scale, 12*scale, 18*scale))
-        pygame.draw.rect(self.screen, wheel_color, 
-                        (x + 48*scale, y + 50*scale, 12*scale, 18*scale))
+            sprite = car_sprites.get(*LOCKED_SKIN_COLORS, shape='mini')
+        
+        self.screen.blit(sprite, (x, y))
     
     def draw_game(self):
         """Dibuja el juego en progreso"""
@@ -1017,27 +1906,8 @@ class Game:
     
     def _draw_player_info(self):
         """Dibuja la información de los jugadores en la parte superior"""
-        info_height = 110
-        pygame.draw.rect(self.screen, DARK_GREEN, (0, 0, SCREEN_WIDTH, info_height))
-        
-        for i, player in enumerate(self.players):
-            x = 60 if i == 0 else SCREEN_WIDTH - 300
-            y = 25
-            
-            self.draw_text(f"JUGADOR {player.player_num}", self.font_tiny, GREEN, 
-                          x, y, center=False)
-            self.draw_text(f"Puntos: {player.score}", self.font_tiny, GREEN, 
-                          x, y + 28, center=False)
-            self.draw_text(f"Nivel: {LEVELS[player.level]['name']}", self.font_tiny, GREEN, 
-                          x, y + 56, center=False)
-            self.draw_text(f"Velocidad: {player.speed_multiplier:.1f}x", self.font_tiny, GREEN, 
-                          x, y + 84, center=False)
-            
-            # Mostrar piel actual
-            skin_name = player.skins[player.current_skin]['name']
-            self.draw_text(f"Skin: {skin_name}", self.font_tiny, 
-                          player.skins[player.current_skin]['body'], 
-                          x, y + 112, center=False)
+        self.hud.update(self.players)
+        self.hud.draw(self.screen)
     
     
     def _draw_game_area(self):
@@ -1054,11 +1924,17 @@ class Game:
     def _draw_single_player_canvas(self, game_y):
         """Dibuja el canvas para modo un jugador"""
         canvas_x = (SCREEN_WIDTH - CANVAS_WIDTH) // 2
-        game_surface = pygame.Surface((CANVAS_WIDTH, CANVAS_HEIGHT))
-        
-        self.players[0].x_offset = 0
-        self.players[0].draw(game_surface)
-        self.screen.blit(game_surface, (canvas_x, game_y))
+        canvas_rect = pygame.Rect(canvas_x, game_y, CANVAS_WIDTH, CANVAS_HEIGHT)
+        self.canvas_rects = [canvas_rect]
+        
+        # Si solo se redibuja otra región, no hace falta dibujar el canvas
+        if self.screen.get_clip().colliderect(canvas_rect):
+            start = time.perf_counter()
+            game_surface = self.surfaces.get_canvas(0)
+            self.players[0].x_offset = 0
+            self.players[0].draw(game_surface, self.sim_accumulator / SIM_TICK)
+            self.screen.blit(game_surface, canvas_rect)
+            self.profiler.add('canvas 1', time.perf_counter() - start)
         
         # Borde del canvas
         pygame.draw.rect(self.screen, GREEN, 
@@ -1070,21 +1946,37 @@ class Game:
         spacing = 20
         total_width = CANVAS_WIDTH * 2 + spacing
         start_x = (SCREEN_WIDTH - total_width) // 2
+        self.canvas_rects = []
         
         for i, player in enumerate(self.players):
             canvas_x = start_x + i * (CANVAS_WIDTH + spacing)
-            game_surface = pygame.Surface((CANVAS_WIDTH, CANVAS_HEIGHT))
+            canvas_rect = pygame.Rect(canvas_x, game_y, CANVAS_WIDTH, CANVAS_HEIGHT)
+            self.canvas_rects.append(canvas_rect)
             
-            player.x_offset = 0
-            player.draw(game_surface)
-            self.screen.blit(game_surface, (canvas_x, game_y))
+            if self.screen.get_clip().colliderect(canvas_rect):
+                start = time.perf_counter()
+                game_surface = self.surfaces.get_canvas(i)
+                player.x_offset = 0
+                player.draw(game_surface, self.sim_accumulator / SIM_TICK)
+                self.screen.blit(game_surface, canvas_rect)
+                self.profiler.add(f'canvas {player.player_num}', time.perf_counter() - start)
             
             # Borde del canvas
             pygame.draw.rect(self.screen, player.color, 
                            (canvas_x - 2, game_y - 2, CANVAS_WIDTH + 4, CANVAS_HEIGHT + 4), 2)
     
     def draw_game_over(self):
-        """Dibuja la pantalla de game over"""
+        """Dibuja la pantalla de game over desde su capa cacheada"""
+        hovered = self._get_hovered([rect for rect, _, _ in self.game_over_buttons])
+        scores = tuple((player.player_num, player.score) for player in self.players)
+        key = (self.game_mode, scores, self.final_stats, hovered)
+        
+        layer = self._get_cached_layer('game_over', key, self._draw_game_over_layer)
+        self.screen.blit(layer, (0, 0))
+    
+    
+    def _draw_game_over_layer(self):
+        """Dibuja la pantalla de game over completa"""
         self.screen.fill(BLACK)
         
         # Fondo semi-transparente
@@ -1103,10 +1995,7 @@ class Game:
     
     def _draw_overlay(self):
         """Dibuja una capa semi-transparente"""
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.surfaces.get_overlay(200), (0, 0))
     
     
     def _draw_final_scores(self):
@@ -1121,24 +2010,30 @@ class Game:
                 self.draw_text(f"Jugador {player.player_num}: {player.score} puntos", 
                               self.font_medium, player.color, SCREEN_WIDTH // 2, y)
                 y += 55
+        
+        if self.final_stats:
+            self._draw_history_stats(y + 60)
+    
+    
+    def _draw_history_stats(self, y):
+        """Dibuja a cuántas partidas superó cada jugador y la mediana y el p90 del historial"""
+        ranks, p50, p90, total = self.final_stats
+        
+        if self.game_mode == 'single':
+            text = f"¡Superaste al {ranks[0][1]}% de las partidas!"
+        else:
+            text = "  |  ".join(f"Jugador {num}: superó al {rank}%" for num, rank in ranks)
+        self.draw_text(text, self.font_small, YELLOW, SCREEN_WIDTH // 2, y)
+        
+        self.draw_text(f"Historial de {total} partidas: mediana {p50} - p90 {p90} puntos",
+                      self.font_tiny, GREEN, SCREEN_WIDTH // 2, y + 45)
     
     
     def _draw_game_over_buttons(self):
         """Dibuja los botones de game over"""
         mouse_pos = pygame.mouse.get_pos()
-        button_y = SCREEN_HEIGHT - 180
-        
-        buttons = [
-            ("MENÚ PRINCIPAL", 'menu', button_y),
-            ("JUGAR DE NUEVO", 'restart', button_y + 75)
-        ]
-        
-        self.game_over_buttons = []
         
-        for text, action, y in buttons:
-            button_rect = pygame.Rect(SCREEN_WIDTH // 2 - 200, y, 400, 60)
-            self.game_over_buttons.append((button_rect, action))
-            
+        for button_rect, _, text in self.game_over_buttons:
             if button_rect.collidepoint(mouse_pos):
                 pygame.draw.rect(self.screen, GREEN, button_rect)
                 text_color = BLACK
@@ -1148,23 +2043,36 @@ class Game:
             
             pygame.draw.rect(self.screen, GREEN, button_rect, 3)
             self.draw_text(text, self.font_small, text_color, 
-                          SCREEN_WIDTH // 2, y + 30)
+                          SCREEN_WIDTH // 2, button_rect.y + 30)
     
     
     # ========================================
     # MÉTODOS DE CONTROL DEL JUEGO
     # ========================================
     
-    def start_game(self, mode):
-        """Inicia un nuevo juego"""
+    def start_game(self, mode, seed=None):
+        """
+        Inicia un nuevo juego
+        
+        Args:
+            mode: 'single' o 'multi'
+            seed: Semilla del tráfico para repetir una partida o comparar
+                  variantes (None = una nueva al azar). La semilla usada
+                  queda en self.race_seed: start_game(mode, self.race_seed)
+                  repite la carrera. En modo multijugador ambos jugadores
+                  reciben el mismo tráfico.
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.race_seed = seed
         self.game_mode = mode
         self.state = 'game'
         
         # Crear jugadores
         if mode == 'single':
-            self.players = [Player(1, 0)]
+            self.players = [Player(1, 0, seed)]
         else:
-            self.players = [Player(1, 0), Player(2, 0)]
+            self.players = [Player(1, 0, seed), Player(2, 0, seed)]
         
         self.play_music()
     
@@ -1186,9 +2094,10 @@ class Game:
         self.stop_music()
         self.play_sound(self.explosion_sound)
         
-        # Guardar puntuaciones
+        # Guardar puntuaciones (el disco se escribe en el hilo de fondo)
         for player in self.players:
-            self.save_score(f"Jugador {player.player_num}", player.score)
+            self.save_score(f"Jugador {player.player_num}", player.score, self.game_mode)
+        self.final_stats = self._get_final_stats()
         
         self.state = 'game_over'
     
@@ -1199,12 +2108,14 @@ class Game:
     
     def handle_menu_click(self, pos):
         """Maneja clics en el menú principal"""
-        for button_rect, action in self.menu_buttons:
+        for button_rect, action, _ in self.menu_buttons:
             if button_rect.collidepoint(pos):
                 if action == 'quit':
                     return False
                 elif action == 'scores':
                     self.state = 'scores'
+                    self.scores_page = 0
+                    self.scores_page_data = None
                 elif action == 'shop':
                     self.state = 'shop'
                 else:
@@ -1221,11 +2132,11 @@ class Game:
             return
         
         # Selector de jugador
-        if hasattr(self, 'player_button_1') and self.player_button_1.collidepoint(pos):
+        if self.player_button_1.collidepoint(pos):
             self.selected_player = 1
             return
         
-        if hasattr(self, 'player_button_2') and self.player_button_2.collidepoint(pos):
+        if self.player_button_2.collidepoint(pos):
             self.selected_player = 2
             return
     
@@ -1234,11 +2145,27 @@ class Game:
         """Maneja clics en la pantalla de puntuaciones"""
         if self.back_button.collidepoint(pos):
             self.state = 'menu'
+            return
+        
+        _, has_next = self._get_scores_page()
+        for rect, step, _ in self._get_page_buttons(has_next):
+            if rect.collidepoint(pos):
+                self._change_scores_page(step)
+    
+    
+    def _change_scores_page(self, step):
+        """Avanza o retrocede una página si existe"""
+        _, has_next = self._get_scores_page()
+        if (step < 0 and self.scores_page == 0) or (step > 0 and not has_next):
+            return
+        
+        self.scores_page += step
+        self.scores_page_data = None
     
     
     def handle_game_over_click(self, pos):
         """Maneja clics en la pantalla de game over"""
-        for button_rect, action in self.game_over_buttons:
+        for button_rect, action, _ in self.game_over_buttons:
             if button_rect.collidepoint(pos):
                 if action == 'menu':
                     self.state = 'menu'
@@ -1268,38 +2195,35 @@ class Game:
     # MÉTODOS DE GESTIÓN DE PUNTUACIONES
     # ========================================
     
-    def save_score(self, name, score):
-        """Guarda una puntuación en el archivo"""
+    def save_score(self, name, score, mode=None):
+        """Registra una partida en el diario de puntuaciones (una línea al final)"""
         # Acumular puntos totales
         if 'Jugador 1' in name:
             self.total_score_p1 += score
         elif 'Jugador 2' in name:
             self.total_score_p2 += score
         
-        scores = self.get_top_scores()
-        
-        scores.append({
-            'name': name,
-            'score': score,
-            'date': datetime.now().strftime('%Y-%m-%d')
-        })
-        
-        scores.sort(key=lambda x: x['score'], reverse=True)
-        scores = scores[:3]  # Solo mantener top 3
+        self.leaderboard.add_score(name, score, mode=mode)
+        self.scores_page_data = None
+    
+    
+    def _get_final_stats(self):
+        """
+        Posición de los jugadores en el historial, sin recorrerlo
         
-        with open(self.scores_file, 'w') as f:
-            json.dump(scores, f, indent=2)
+        Returns:
+            (pares (jugador, porcentaje de partidas superadas), mediana,
+            p90, partidas en el historial)
+        """
+        histogram = self.leaderboard.get_histogram()
+        ranks = tuple((player.player_num, int(histogram.rank(player.score)))
+                      for player in self.players)
+        return (ranks, histogram.quantile(0.5), histogram.quantile(0.9), histogram.total)
     
     
     def get_top_scores(self):
-        """Obtiene las mejores puntuaciones"""
-        if os.path.exists(self.scores_file):
-            try:
-                with open(self.scores_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+        """Obtiene las mejores puntuaciones (desde memoria, sin leer el disco)"""
+        return self.leaderboard.get_top_scores()
     
     # ========================================
     # LOOP PRINCIPAL DEL JUEGO
@@ -1311,26 +2235,65 @@ class Game:
         keys_pressed = set()
         
         self._print_welcome_message()
+        if self.profile_on_start:
+            self.profile_capture.start()
+        last_time = time.perf_counter()
+        woken_event = None
         
-        while running:
-            # Procesar eventos
-            running = self._process_events(keys_pressed)
-            
-            # Actualizar estado
-            self._update_state()
-            
-            # Renderizar
-            self._render()
-            
-            # Mantener FPS
-            pygame.display.flip()
-            self.clock.tick(FPS)
-        
-        # Salir
+        try:
+            while running:
+                # Medir el tiempo real transcurrido
+                now = time.perf_counter()
+                elapsed = now - last_time
+                last_time = now
+                
+                profiler = self.profiler
+                profiler.begin_frame(self.pacer.get_rate(self.state))
+                
+                # Procesar eventos
+                state = self.state
+                running = self._process_events(keys_pressed, woken_event)
+                profiler.lap('events')
+                
+                # Una partida que recién empieza no hereda la espera de los menús
+                if self.state != state:
+                    elapsed = 0.0
+                
+                # Actualizar estado
+                self._update_state(elapsed)
+                profiler.lap('update')
+                
+                # Renderizar y presentar (no hay nada que mostrar minimizado)
+                if not self.pacer.minimized:
+                    dirty = self._render()
+                    profiler.lap('render', 'scene ' + self.state)
+                    self._present(dirty)
+                    profiler.lap('present')
+                profiler.end_frame()
+                
+                # Esperar según lo que se muestra: FPS completos solo en carrera
+                woken_event = self.pacer.wait(self.state)
+        finally:
+            # Salir, también por una excepción: lo encolado se escribe antes de cerrar
+            self._close_files()
+        
+        self.pacer.print_report()
+        self.writer.print_report()
         pygame.quit()
         sys.exit()
     
     
+    def _close_files(self):
+        """Detiene la captura y cierra la tabla y la cola; un fallo no salta los siguientes"""
+        try:
+            self.profile_capture.stop()
+        finally:
+            try:
+                self.leaderboard.close()
+            finally:
+                self.writer.close()
+    
+    
     def toggle_fullscreen(self):
         """Alterna entre pantalla completa y modo ventana"""
         self.fullscreen = not self.fullscreen
@@ -1338,6 +2301,16 @@ class Game:
             self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
         else:
             self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        
+        # Los sprites, la carretera y los canvas dependen del formato de la pantalla
+        car_sprites.build_all()
+        road_texture.clear()
+        self.surfaces.reset()
+        self.hud.reset()
+        self.profiler.reset()
+        
+        if self.dirty_rects:
+            self.dirty_rects.invalidate()
     
     
     def _print_welcome_message(self):
@@ -1347,13 +2320,26 @@ class Game:
         print("   - Jugador 1: Flechas ← →")
         print("   - Jugador 2: A D")
         print("   - F11: Pantalla completa")
+        print("   - F3: Tiempos por frame")
+        print("   - F4: Iniciar/detener captura de cProfile")
         print("   - ESC: Volver al menú / Salir")
         print("\n¡Disfruta del juego!\n")
     
     
-    def _process_events(self, keys_pressed):
-        """Procesa todos los eventos de pygame"""
-        for event in pygame.event.get():
+    def _process_events(self, keys_pressed, woken_event=None):
+        """
+        Procesa todos los eventos de pygame
+        
+        Args:
+            keys_pressed: Teclas presionadas
+            woken_event: Evento que despertó la espera del frame anterior;
+                         se procesa antes que los de la cola
+        """
+        events = pygame.event.get()
+        if woken_event is not None:
+            events.insert(0, woken_event)
+        
+        for event in events:
             if event.type == pygame.QUIT:
                 return False
             
@@ -1361,6 +2347,14 @@ class Game:
                 # Toggle pantalla completa con F11
                 if event.key == pygame.K_F11:
                     self.toggle_fullscreen()
+                # Overlay de tiempos por frame con F3
+                elif event.key == pygame.K_F3:
+                    self.profiler.toggle()
+                    if self.dirty_rects:
+                        self.dirty_rects.invalidate()
+                # Captura de cProfile con F4
+                elif event.key == pygame.K_F4:
+                    self.profile_capture.toggle()
                 # Permitir salir con ESC
                 elif event.key == pygame.K_ESCAPE:
                     if self.state == 'game':
@@ -1376,6 +2370,18 @@ class Game:
             
             elif event.type == pygame.KEYUP:
                 self._handle_key_up(event.key, keys_pressed)
+            
+            # Foco y minimización: ajustan el ritmo de frames
+            elif event.type in (pygame.WINDOWFOCUSLOST, pygame.WINDOWFOCUSGAINED,
+                                pygame.WINDOWMINIMIZED, pygame.WINDOWRESTORED):
+                self.pacer.handle_window_event(event)
+                if event.type == pygame.WINDOWRESTORED and self.dirty_rects:
+                    self.dirty_rects.invalidate()
+            
+            # La ventana se volvió a mostrar: su contenido puede haberse perdido
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                if self.dirty_rects:
+                    self.dirty_rects.invalidate()
         
         return True
     
@@ -1401,6 +2407,10 @@ class Game:
             if self.state == 'game':
                 keys = pygame.key.get_pressed()
                 self.handle_controls(keys)
+            
+            # Páginas de puntuaciones con las flechas
+            elif self.state == 'scores' and key in (pygame.K_LEFT, pygame.K_RIGHT):
+                self._change_scores_page(-1 if key == pygame.K_LEFT else 1)
     
     
     def _handle_key_up(self, key, keys_pressed):
@@ -1409,14 +2419,111 @@ class Game:
             keys_pressed.remove(key)
     
     
-    def _update_state(self):
-        """Actualiza el estado del juego"""
-        if self.state == 'game':
+    def _update_state(self, elapsed):
+        """
+        Actualiza el estado del juego en pasos fijos de SIM_TICK
+        
+        Args:
+            elapsed: Segundos reales desde el frame anterior
+        """
+        if self.state != 'game':
+            self.sim_accumulator = 0.0
+            return
+        
+        # Limitar el atraso para no entrar en una espiral bajo carga
+        self.sim_accumulator += min(elapsed, SIM_TICK * MAX_SIM_TICKS_PER_FRAME)
+        
+        while self.sim_accumulator >= SIM_TICK and self.state == 'game':
             self.update_game()
+            self.sim_accumulator -= SIM_TICK
     
     
     def _render(self):
-        """Renderiza la pantalla actual"""
+        """
+        Renderiza la pantalla actual
+        
+        Returns:
+            Lista de regiones modificadas, o None si se redibujó todo
+        """
+        tracker = self.dirty_rects
+        scene = (self.state, self.game_mode, self.selected_player, self.scores_page)
+        
+        if tracker is None or tracker.needs_full_redraw(scene):
+            self._draw_scene()
+            if tracker:
+                tracker.commit(scene, self._get_scene_regions())
+            return None
+        
+        # Redibujar una sola vez, recortado a las filas que cubren las regiones
+        # que cambiaron (fill y blit son más rápidos con filas completas); los
+        # canvas fuera del recorte no se dibujan. Solo se presentan las regiones
+        dirty = tracker.diff(self._get_scene_regions())
+        if dirty:
+            union = dirty[0].unionall(dirty[1:])
+            self.screen.set_clip(pygame.Rect(0, union.top, self.screen.get_width(), union.height))
+            self._draw_scene()
+            self.screen.set_clip(None)
+        return dirty
+    
+    
+    def _present(self, dirty):
+        """Envía a la pantalla las regiones modificadas, o todo si dirty es None"""
+        if dirty is None:
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update(dirty)
+    
+    
+    def _get_scene_regions(self):
+        """
+        Describe las regiones de la escena actual que pueden cambiar
+        
+        Returns:
+            Lista de pares (rect, clave); la región se redibuja cuando
+            cambia su clave
+        """
+        regions = self._get_state_regions()
+        if self.profiler.visible:
+            regions.append((self.profiler.get_rect(), self.profiler.version))
+        return regions
+    
+    
+    def _get_state_regions(self):
+        """Regiones de la pantalla del estado actual"""
+        mouse_pos = pygame.mouse.get_pos()
+        
+        if self.state == 'menu':
+            regions = [(self.title_rect, self._get_title_alpha())]
+            regions += [(rect, rect.collidepoint(mouse_pos)) for rect, _, _ in self.menu_buttons]
+            return regions
+        elif self.state == 'scores':
+            _, has_next = self._get_scores_page()
+            regions = [(self.back_button, self.back_button.collidepoint(mouse_pos))]
+            regions += [(rect, rect.collidepoint(mouse_pos))
+                        for rect, _, _ in self._get_page_buttons(has_next)]
+            return regions
+        elif self.state == 'shop':
+            regions = [(self.back_button, self.back_button.collidepoint(mouse_pos)),
+                       (self.player_button_1, self.player_button_1.collidepoint(mouse_pos)),
+                       (self.player_button_2, self.player_button_2.collidepoint(mouse_pos))]
+            total_score = self.total_score_p1 if self.selected_player == 1 else self.total_score_p2
+            unlocked_count = self._get_unlocked_count(total_score)
+            regions += [(rect, rect.collidepoint(mouse_pos))
+                        for rect in self.skin_card_rects[:unlocked_count]]
+            return regions
+        elif self.state == 'game':
+            regions = self.hud.get_regions(self.players)
+            regions += [(rect, (player.frame_count, self.sim_accumulator, player.alive,
+                                player.current_skin, player.new_skin_unlocked))
+                        for rect, player in zip(self.canvas_rects, self.players)]
+            return regions
+        elif self.state == 'game_over':
+            return [(rect, rect.collidepoint(mouse_pos)) for rect, _, _ in self.game_over_buttons]
+        return []
+    
+    
+    def _draw_scene(self):
+        """Dibuja la escena del estado actual"""
         if self.state == 'menu':
             self.draw_menu()
         elif self.state == 'scores':
@@ -1427,6 +2534,9 @@ class Game:
             self.draw_game()
         elif self.state == 'game_over':
             self.draw_game_over()
+        
+        if self.profiler.visible:
+            self.profiler.draw(self.screen)
 
 
 # ============================================
@@ -1434,8 +2544,24 @@ class Game:
 # ============================================
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Carrera retro 8-bit")
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help="Redibujar solo las regiones que cambian (pantallas por software)")
+    parser.add_argument('--frame-log', default=None,
+                        help="Archivo JSONL con percentiles de tiempo por fase cada "
+                             f"{PROFILER_WINDOW} frames")
+    parser.add_argument('--profile', action='store_true',
+                        help="Capturar con cProfile desde el inicio (F4 la detiene)")
+    parser.add_argument('--profile-dir', default=PROFILE_DIR,
+                        help="Carpeta de las capturas de cProfile")
+    parser.add_argument('--scores-db', default=None,
+                        help="Guardar el historial de puntuaciones en esta base SQLite")
+    args = parser.parse_args()
+    
     print("=" * 50)
     print("🏁 CARRERA RETRO 8-BIT 🏁")
     print("=" * 50)
-    game = Game()
+    game = Game(dirty_rects=args.dirty_rects, frame_log=args.frame_log,
+                profile=args.profile, profile_dir=args.profile_dir,
+                scores_db=args.scores_db)
     game.run()
@@ -0,0 +1,734 @@
+"""
+🏆 TABLA DE PUNTAJES - Juego de Carreras Retro
+Historial completo de partidas con las mejores puntuaciones en memoria.
+
+Cada partida se agrega como una línea JSON al final de un diario
+(scores.jsonl) que nunca se reescribe, así que se conserva todo el
+historial. En memoria se mantiene un heap acotado por tabla (global,
+por jugador y por modo): agregar una partida cuesta O(log k) más una
+escritura al final del archivo.
+
+Además, un histograma (histogram.py) cuenta todas las partidas para dar
+percentiles sin recorrer el historial.
+
+Cada COMPACT_EVERY partidas se compacta: las tablas, el histograma y la
+posición leída del diario se guardan en una instantánea, y al iniciar solo se relee lo
+que se agregó después. Al compactar también se reescribe scores.json con
+el top global en el formato de siempre (lo lee game.py).
+
+Si otro proceso agrega partidas, el diario crece y solo se leen las
+líneas nuevas; las escrituras propias no provocan relecturas. Con un
+BackgroundWriter (persistence.py) las escrituras se encolan y las hace
+otro hilo; las tablas en memoria se actualizan igual al instante. No
+depende de Pygame.
+
+SQLiteLeaderboard guarda el historial en una base SQLite con índices, para
+consultas que un top-k no responde (la mejor partida de la semana, el top
+100 de un modo). Tiene la misma interfaz y se elige con --scores-db; con
+un BackgroundWriter la base se abre y las partidas se insertan en su hilo.
+
+Uso básico:
+    leaderboard = Leaderboard('scores.json')
+    leaderboard.add_score("Jugador 1", 42, mode='single')
+    print(leaderboard.get_top_scores())
+    print(leaderboard.get_top_scores(player="Jugador 1"))
+    leaderboard.close()
+"""
+
+# ============================================
+# IMPORTACIONES
+# ============================================
+import heapq
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+
+from histogram import ScoreHistogram, get_bucket
+
+
+# Puntuaciones que se conservan en cada tabla
+TOP_SCORES = 3
+
+# Partidas agregadas entre compactaciones
+COMPACT_EVERY = 50
+
+
+# ============================================
+# CLASE LEADERBOARD
+# ============================================
+
+class Leaderboard:
+    """
+    Diario de partidas con tablas top-k en memoria.
+
+    Cada tabla es un heap de mínimos de a lo sumo size entradas
+    (puntos, -orden, registro): la raíz es la peor entrada conservada y
+    una partida nueva solo entra si la supera. Entre puntos iguales queda
+    la partida más antigua, igual que con el ordenamiento estable de antes.
+    """
+
+    def __init__(self, path, size=TOP_SCORES, compact_every=COMPACT_EVERY, writer=None):
+        """
+        Inicializa la tabla sin leer los archivos todavía
+
+        Args:
+            path: Archivo JSON con el top global (scores.json); el diario y
+                  la instantánea usan el mismo nombre con otra extensión
+            size: Puntuaciones que se conservan en cada tabla
+            compact_every: Partidas agregadas entre compactaciones
+            writer: BackgroundWriter para escribir fuera del hilo del juego
+                    (None = escribir en el momento)
+        """
+        base = os.path.splitext(path)[0]
+        self.path = path
+        self.journal_path = base + '.jsonl'
+        self.snapshot_path = base + '.snapshot.json'
+        self.size = size
+        self.compact_every = compact_every
+        self.writer = writer
+
+        self.boards = {}
+        self.sorted_boards = {}
+        self.histogram = ScoreHistogram()
+        self.runs = 0
+        self.offset = 0
+        self.signature = None
+        self.loaded = False
+        self.journal = None
+        self.pending_compaction = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.compactions = 0
+
+    # ========================================
+    # CONSULTAS
+    # ========================================
+
+    def get_top_scores(self, k=None, player=None, mode=None):
+        """
+        Obtiene las mejores puntuaciones de una tabla, de mayor a menor
+
+        Args:
+            k: Cantidad a retornar (None = todas las conservadas)
+            player: Nombre del jugador para su tabla personal
+            mode: 'single' o 'multi' para la tabla del modo
+        """
+        self._refresh()
+        scores = self._get_sorted(self._board_key(player, mode))
+        return scores if k is None else scores[:k]
+
+
+    def get_run_count(self):
+        """Cantidad total de partidas registradas en el diario"""
+        self._refresh()
+        return self.runs
+
+
+    def get_histogram(self):
+        """Histograma de todas las partidas (para percentiles)"""
+        self._refresh()
+        return self.histogram
+
+
+    def get_page(self, page, page_size, mode=None):
+        """
+        Obtiene una página de la tabla global o de un modo
+
+        Returns:
+            (puntuaciones de la página, hay una página siguiente)
+        """
+        scores = self.get_top_scores(mode=mode)
+        start = page * page_size
+        return scores[start:start + page_size], len(scores) > start + page_size
+
+
+    def _board_key(self, player=None, mode=None):
+        """Clave de la tabla: 'global', 'player:<nombre>' o 'mode:<modo>'"""
+        if player is not None:
+            return f"player:{player}"
+        if mode is not None:
+            return f"mode:{mode}"
+        return 'global'
+
+
+    def _get_sorted(self, key):
+        """Copia de la tabla ordenada de mayor a menor, recalculada solo si cambió"""
+        scores = self.sorted_boards.get(key)
+        if scores is None:
+            entries = sorted(self.boards.get(key, ()), reverse=True)
+            scores = self.sorted_boards[key] = [record for _, _, record in entries]
+        return list(scores)
+
+    # ========================================
+    # LECTURA DEL DIARIO
+    # ========================================
+
+    def _refresh(self):
+        """Lee lo que cambió en el diario desde la última lectura"""
+        # Con escrituras propias en cola la memoria va adelante del disco
+        if self.loaded and self.writer is not None and self.writer.is_pending(self.journal_path):
+            self.hits += 1
+            return
+
+        signature = self._get_signature()
+        if self.loaded and signature == self.signature:
+            self.hits += 1
+            return
+
+        self.misses += 1
+        if not self.loaded or signature is None or signature[1] < self.offset:
+            # Primera lectura, o el diario fue reemplazado: leer todo
+            self._load()
+        else:
+            # Otro proceso agregó partidas: leer solo las líneas nuevas
+            self._read_journal()
+        self.signature = self._get_signature()
+
+
+    def _get_signature(self):
+        """Firma del diario: (mtime_ns, tamaño), o None si no existe"""
+        try:
+            stat = os.stat(self.journal_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+    def _load(self):
+        """Carga la instantánea y lee el diario desde donde quedó"""
+        self.boards = {}
+        self.sorted_boards = {}
+        self.histogram = ScoreHistogram()
+        self.runs = 0
+        self.offset = 0
+        self.loaded = True
+
+        if not os.path.exists(self.journal_path):
+            self._import_legacy_scores()
+            return
+
+        # Una instantánea más larga que el diario es de otro diario
+        snapshot = self._read_snapshot()
+        histogram = snapshot and ScoreHistogram.from_dict(snapshot['histogram'])
+        if histogram and snapshot['offset'] <= os.path.getsize(self.journal_path):
+            self.histogram = histogram
+            self.runs = snapshot['runs']
+            self.offset = snapshot['offset']
+            for key, entries in snapshot['boards'].items():
+                self.boards[key] = [tuple(entry) for entry in entries]
+
+        self._read_journal()
+
+
+    def _read_snapshot(self):
+        """Lee la instantánea de la última compactación (None si falta o está dañada)"""
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (not isinstance(snapshot, dict)
+                or not {'offset', 'runs', 'boards', 'histogram'} <= set(snapshot)):
+            return None
+        return snapshot
+
+
+    def _read_journal(self):
+        """Agrega a las tablas las líneas completas del diario desde self.offset"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return
+
+        # Una línea sin salto final todavía se está escribiendo
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Línea cortada por una interrupción
+            if isinstance(record, dict) and 'score' in record:
+                self._insert(record)
+
+        self.offset += end
+
+
+    def _import_legacy_scores(self):
+        """Pasa al diario las puntuaciones de un scores.json anterior al diario"""
+        try:
+            with open(self.path, 'r') as f:
+                scores = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if isinstance(scores, list):
+            for record in scores:
+                if isinstance(record, dict) and 'score' in record:
+                    self._append(record)
+
+    # ========================================
+    # ESCRITURA
+    # ========================================
+
+    def add_score(self, name, score, date=None, mode=None):
+        """
+        Registra una partida en el diario y en las tablas
+
+        Args:
+            name: Nombre del jugador
+            score: Puntuación de la partida
+            date: Fecha 'AAAA-MM-DD' (None = hoy)
+            mode: 'single' o 'multi' (None = sin modo)
+        """
+        self._refresh()
+
+        record = {
+            'name': name,
+            'score': score,
+            'date': date or datetime.now().strftime('%Y-%m-%d')
+        }
+        if mode is not None:
+            record['mode'] = mode
+
+        self._append(record)
+        self.signature = self._get_signature()
+
+        if self.pending_compaction >= self.compact_every:
+            self.compact()
+
+
+    def _append(self, record):
+        """Agrega una línea al final del diario y la inserta en las tablas"""
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        if self.writer is not None:
+            self.writer.append(self.journal_path, line)
+        else:
+            if self.journal is None:
+                self.journal = open(self.journal_path, 'ab')
+            self.journal.write(line)
+            self.journal.flush()
+
+        self.offset += len(line)
+        self._insert(record)
+        self.writes += 1
+        self.pending_compaction += 1
+
+
+    def _insert(self, record):
+        """Inserta una partida en la tabla global, la de su jugador y la de su modo"""
+        self.runs += 1
+        self.histogram.add(record['score'])
+        entry = (record['score'], -self.runs, record)
+
+        keys = ['global', self._board_key(player=record.get('name'))]
+        if 'mode' in record:
+            keys.append(self._board_key(mode=record['mode']))
+
+        for key in keys:
+            board = self.boards.setdefault(key, [])
+            if len(board) < self.size:
+                heapq.heappush(board, entry)
+            elif entry > board[0]:
+                heapq.heapreplace(board, entry)
+            else:
+                continue
+            self.sorted_boards.pop(key, None)
+
+    # ========================================
+    # COMPACTACIÓN
+    # ========================================
+
+    def compact(self):
+        """
+        Guarda las tablas, el histograma y la posición del diario en la
+        instantánea, y el top global en scores.json, para no releer todo el
+        diario al iniciar
+        """
+        if not self.loaded:
+            return
+
+        snapshot = {
+            'offset': self.offset,
+            'runs': self.runs,
+            'boards': self.boards,
+            'histogram': self.histogram.to_dict()
+        }
+        self._write_atomic(self.snapshot_path, snapshot)
+        self._write_atomic(self.path, self._get_sorted('global'), indent=2)
+
+        self.pending_compaction = 0
+        self.compactions += 1
+
+
+    def _write_atomic(self, path, data, indent=None):
+        """Escribe un JSON en un archivo temporal y lo reemplaza de una vez"""
+        if self.writer is not None:
+            # Se serializa ahora: las tablas siguen cambiando mientras espera
+            self.writer.replace(path, json.dumps(data, indent=indent))
+            return
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=indent)
+        os.replace(temp_path, path)
+
+
+    def close(self):
+        """Compacta si hay partidas nuevas y cierra el diario (el writer lo cierra su dueño)"""
+        if self.pending_compaction:
+            self.compact()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+
+    def get_stats(self):
+        """Obtiene los contadores de la caché y del diario"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'runs': self.runs,
+            'compactions': self.compactions
+        }
+
+
+# ============================================
+# CLASE SQLITELEADERBOARD
+# ============================================
+
+class SQLiteLeaderboard:
+    """
+    Historial de partidas en SQLite, con la interfaz de Leaderboard.
+
+    La base usa WAL, así otros procesos pueden leerla mientras el juego
+    escribe. Con un BackgroundWriter, abrirla (tabla, índices e importación
+    del historial JSON) y cada inserción corren en el hilo de escritura: una
+    partida queda en la base a los BATCH_DELAY de registrarse, y las de un
+    mismo game over van en una sola transacción. Sin writer se insertan en
+    el momento. El histograma de puntuaciones se guarda en la tabla
+    score_histogram (balde, partidas), actualizada en la misma transacción;
+    el de memoria se actualiza al instante. Una sola conexión compartida
+    entre los dos hilos, protegida por lock. Los índices (mode, score), (name, score), (name, date) y
+    (date) cubren el top por modo, los mejores de un jugador, su historial
+    y los rangos de fechas; (score) cubre el top global. Los puntos van en orden
+    descendente para que el índice ya entregue ORDER BY score DESC, id sin
+    ordenar aparte.
+    """
+
+    def __init__(self, path, size=TOP_SCORES, batch_size=1,
+                 scores_file='scores.json', writer=None):
+        """
+        Inicializa la tabla; con writer la base se empieza a abrir en su hilo
+
+        Args:
+            path: Archivo de la base SQLite
+            size: Puntuaciones que retorna get_top_scores por defecto
+            batch_size: Partidas por transacción sin writer (1 = cada una al
+                        registrarla; más solo para cargas masivas)
+            scores_file: JSON donde se exporta el top global al cerrar (game.py
+                         lo lee); también se importa si la base es nueva
+            writer: BackgroundWriter para abrir la base e insertar fuera del
+                    hilo del juego (None = en el momento)
+        """
+        self.path = path
+        self.size = size
+        self.batch_size = batch_size
+        self.scores_file = scores_file
+        self.writer = writer
+        self.connection = None
+        self.pending = []
+        self.histogram = None
+        self.lock = threading.RLock()
+        self.ready = threading.Event()
+
+        self.queries = 0
+        self.writes = 0
+        self.transactions = 0
+
+        if writer is not None:
+            writer.call(path, self._open)
+
+    # ========================================
+    # BASE DE DATOS
+    # ========================================
+
+    def _open(self):
+        """Abre la base en el hilo de escritura y avisa a quien la espera"""
+        try:
+            self._connect()
+        finally:
+            self.ready.set()
+
+
+    def _wait_connection(self, inserted=False):
+        """
+        Conexión abierta; con writer espera a que su hilo termine de abrirla
+
+        Args:
+            inserted: Esperar también las inserciones propias en cola, para
+                      que una consulta vea las partidas recién registradas
+        """
+        if self.writer is not None:
+            if inserted and self.writer.is_pending(self.path):
+                self.writer.flush()
+            self.ready.wait()
+        # Si falló en el hilo, reintentar aquí para que el error se vea
+        return self._connect()
+
+
+    def _connect(self):
+        """Abre la base, crea la tabla y sus índices, e importa el historial JSON"""
+        with self.lock:
+            if self.connection is None:
+                self._create_connection()
+            return self.connection
+
+
+    def _create_connection(self):
+        """Crea la conexión y el esquema; importa el historial si la base es nueva"""
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        tables = {name for name, in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        is_new = 'scores' not in tables
+
+        with connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS scores (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    score INTEGER NOT NULL,
+                    date TEXT NOT NULL,
+                    mode TEXT
+                )""")
+            connection.execute("CREATE INDEX IF NOT EXISTS scores_mode_score ON scores (mode, score DESC)")
+            connection.execute("CREATE INDEX IF NOT EXISTS scores_name_score ON scores (name, score DESC)")
+            connection.execute("CREATE INDEX IF NOT EXISTS scores_name_date ON scores (name, date)")
+            connection.execute("CREATE INDEX IF NOT EXISTS scores_date ON scores (date)")
+            connection.execute("CREATE INDEX IF NOT EXISTS scores_score ON scores (score DESC)")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS score_histogram (
+                    bucket INTEGER PRIMARY KEY,
+                    count INTEGER NOT NULL
+                )""")
+
+            # Base anterior al histograma: contar las partidas una sola vez
+            if not is_new and 'score_histogram' not in tables:
+                counts = Counter(get_bucket(score) for score, in
+                                 connection.execute("SELECT score FROM scores"))
+                connection.executemany("INSERT INTO score_histogram (bucket, count) VALUES (?, ?)",
+                                       counts.items())
+
+        self.connection = connection
+        self.histogram = ScoreHistogram(dict(connection.execute(
+            "SELECT bucket, count FROM score_histogram")))
+        if is_new:
+            # La importación entera va en una sola transacción
+            for row in self._read_json_history():
+                self._add_row(row)
+            self.flush()
+
+
+    def _read_json_history(self):
+        """Partidas del diario JSONL (o del scores.json anterior) para importar"""
+        journal_path = os.path.splitext(self.scores_file)[0] + '.jsonl'
+        records = []
+        try:
+            if os.path.exists(journal_path):
+                with open(journal_path, 'r') as f:
+                    for line in f:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            continue  # Línea cortada por una interrupción
+            else:
+                with open(self.scores_file, 'r') as f:
+                    records = json.load(f)
+        except (OSError, ValueError):
+            return []
+
+        if not isinstance(records, list):
+            return []
+        return [self._to_row(record) for record in records
+                if isinstance(record, dict) and 'score' in record]
+
+
+    def _to_row(self, record):
+        """Convierte un registro del JSON en una fila de la tabla"""
+        return (record.get('name', ''), record['score'],
+                record.get('date') or datetime.now().strftime('%Y-%m-%d'), record.get('mode'))
+
+
+    def _query(self, sql, params=()):
+        """Corre una consulta con lo pendiente insertado; retorna las filas como registros"""
+        connection = self._wait_connection(inserted=True)
+        with self.lock:
+            if self.writer is None:
+                self.flush()
+            self.queries += 1
+            rows = connection.execute(sql, params).fetchall()
+
+        records = []
+        for name, score, date, mode in rows:
+            record = {'name': name, 'score': score, 'date': date}
+            if mode is not None:
+                record['mode'] = mode
+            records.append(record)
+        return records
+
+    # ========================================
+    # CONSULTAS
+    # ========================================
+
+    def get_top_scores(self, k=None, player=None, mode=None, since=None):
+        """
+        Obtiene las mejores puntuaciones, de mayor a menor
+
+        Args:
+            k: Cantidad a retornar (None = size)
+            player: Solo las partidas de este jugador
+            mode: Solo las partidas de este modo
+            since: Solo las partidas desde esta fecha 'AAAA-MM-DD'
+        """
+        where, params = self._get_filter(player, mode, since)
+        return self._query(
+            f"SELECT name, score, date, mode FROM scores {where} "
+            "ORDER BY score DESC, id LIMIT ?",
+            params + [self.size if k is None else k])
+
+
+    def get_page(self, page, page_size, mode=None):
+        """
+        Obtiene una página de la tabla global o de un modo; solo se leen
+        las filas de la página (más una para saber si hay otra)
+
+        Returns:
+            (puntuaciones de la página, hay una página siguiente)
+        """
+        where, params = self._get_filter(mode=mode)
+        scores = self._query(
+            f"SELECT name, score, date, mode FROM scores {where} "
+            "ORDER BY score DESC, id LIMIT ? OFFSET ?",
+            params + [page_size + 1, page * page_size])
+        return scores[:page_size], len(scores) > page_size
+
+
+    def get_run_count(self):
+        """Cantidad total de partidas registradas"""
+        connection = self._wait_connection(inserted=True)
+        with self.lock:
+            if self.writer is None:
+                self.flush()
+            self.queries += 1
+            return connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+
+    def get_histogram(self):
+        """Histograma de todas las partidas, incluidas las que esperan su inserción"""
+        self._wait_connection()
+        return self.histogram
+
+
+    def _get_filter(self, player=None, mode=None, since=None):
+        """Cláusula WHERE y sus parámetros para los filtros dados"""
+        conditions = []
+        params = []
+        for column, operator, value in (('name', '=', player), ('mode', '=', mode),
+                                        ('date', '>=', since)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, params
+
+    # ========================================
+    # ESCRITURA
+    # ========================================
+
+    def add_score(self, name, score, date=None, mode=None):
+        """
+        Registra una partida (con writer se inserta en su hilo)
+
+        Args:
+            name: Nombre del jugador
+            score: Puntuación de la partida
+            date: Fecha 'AAAA-MM-DD' (None = hoy)
+            mode: 'single' o 'multi' (None = sin modo)
+        """
+        self._wait_connection()
+        row = (name, score, date or datetime.now().strftime('%Y-%m-%d'), mode)
+        with self.lock:
+            self._add_row(row)
+            pending = len(self.pending)
+
+        if self.writer is not None:
+            self.writer.call(self.path, self.flush)
+        elif pending >= self.batch_size:
+            self.flush()
+
+
+    def _add_row(self, row):
+        """Deja una fila para el próximo lote y la cuenta en el histograma"""
+        self.pending.append(row)
+        self.histogram.add(row[1])
+
+
+    def flush(self):
+        """Inserta las partidas pendientes en una sola transacción"""
+        with self.lock:
+            if not self.pending:
+                return
+
+            connection = self._connect()
+            counts = Counter(get_bucket(row[1]) for row in self.pending)
+            with connection:
+                connection.executemany(
+                    "INSERT INTO scores (name, score, date, mode) VALUES (?, ?, ?, ?)", self.pending)
+                connection.executemany(
+                    "INSERT INTO score_histogram (bucket, count) VALUES (?, ?) "
+                    "ON CONFLICT (bucket) DO UPDATE SET count = count + excluded.count",
+                    counts.items())
+            self.writes += len(self.pending)
+            self.transactions += 1
+            self.pending = []
+
+
+    def close(self):
+        """Inserta lo pendiente, exporta el top global a scores.json y cierra la base"""
+        # Que el hilo termine de abrir la base e insertar antes de cerrarla
+        if self.writer is not None:
+            self.writer.flush()
+        if self.connection is None and not self.pending:
+            return
+
+        self.flush()
+        scores = self.get_top_scores()
+        temp_path = self.scores_file + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(scores, f, indent=2)
+        os.replace(temp_path, self.scores_file)
+
+        self.connection.close()
+        self.connection = None
+
+
+    def get_stats(self):
+        """Obtiene los contadores de consultas e inserciones"""
+        return {
+            'queries': self.queries,
+            'writes': self.writes,
+            'transactions': self.transactions,
+            'pending': len(self.pending)
+        }
@@ -0,0 +1,291 @@
+"""
+💾 ESCRITURA EN SEGUNDO PLANO - Juego de Carreras Retro
+Saca las escrituras a disco del hilo del juego.
+
+El juego encola lo que quiere guardar y sigue; un hilo aparte junta las
+escrituras en lotes y las hace en orden. Tres tipos de escritura:
+
+- append: agrega al final de un archivo (diarios JSONL). Todo lo que se
+  encoló para el mismo archivo en un lote sale en una sola escritura.
+- replace: reemplaza el archivo completo de forma atómica (archivo
+  temporal + os.replace). Si se encola otro reemplazo del mismo archivo
+  antes de escribirlo, solo se escribe el último.
+- call: corre una función en el hilo (por ejemplo una transacción
+  SQLite). Las funciones encoladas para la misma ruta corren todas, en
+  el orden en que se encolaron.
+
+Los datos de un reemplazo pueden ser una función: se llama en el hilo de
+escritura, así el trabajo de serializar tampoco cae en un frame. No
+depende de Pygame.
+
+Uso básico:
+    writer = BackgroundWriter()
+    writer.append('scores.jsonl', '{"score": 42}\\n')
+    writer.replace('scores.json', '[]')
+    writer.close()  # Espera a que se escriba todo
+"""
+
+# ============================================
+# IMPORTACIONES
+# ============================================
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+# Segundos que se espera a que lleguen más escrituras antes de escribir un lote
+BATCH_DELAY = 0.05
+
+# Lotes recientes con los que se calculan las latencias
+LATENCY_WINDOW = 100
+
+
+# ============================================
+# CLASE BACKGROUNDWRITER
+# ============================================
+
+class BackgroundWriter:
+    """
+    Cola de escrituras atendida por un hilo.
+
+    Las escrituras pendientes se guardan por archivo, en el orden en que
+    se encolaron por primera vez. Todo el estado compartido se protege con
+    una sola Condition.
+    """
+
+    def __init__(self, batch_delay=BATCH_DELAY):
+        """
+        Inicializa la cola e inicia el hilo de escritura
+
+        Args:
+            batch_delay: Segundos que se juntan escrituras antes de cada lote
+        """
+        self.batch_delay = batch_delay
+        self.condition = threading.Condition()
+        self.pending = OrderedDict()  # ruta -> [tipo, datos, hora de encolado]
+        self.busy = set()  # Rutas del lote que se está escribiendo
+        self.flushing = 0
+        self.closed = False
+
+        # Métricas
+        self.depth = 0  # Escrituras encoladas sin terminar
+        self.max_depth = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.writes = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.write_times = deque(maxlen=LATENCY_WINDOW)
+
+        self.thread = threading.Thread(target=self._run, name='background-writer', daemon=True)
+        self.thread.start()
+
+    # ========================================
+    # ENCOLAR
+    # ========================================
+
+    def append(self, path, data):
+        """
+        Encola datos para agregar al final de un archivo
+
+        Args:
+            path: Archivo de destino (se crea si no existe)
+            data: Texto o bytes a agregar
+        """
+        with self.condition:
+            entry = self._get_entry(path, 'append')
+            if entry is None:
+                self.pending[path] = ['append', [data], time.perf_counter()]
+            else:
+                entry[1].append(data)
+            self._count_submitted()
+
+
+    def replace(self, path, data):
+        """
+        Encola el reemplazo atómico de un archivo
+
+        Args:
+            path: Archivo de destino
+            data: Texto, bytes o función que los retorna (se llama en el hilo)
+        """
+        with self.condition:
+            entry = self._get_entry(path, 'replace')
+            if entry is None:
+                self.pending[path] = ['replace', data, time.perf_counter()]
+                self._count_submitted()
+            else:
+                # Solo importa el último contenido: el anterior nunca se escribe
+                entry[1] = data
+                self.submitted += 1
+                self.coalesced += 1
+
+
+    def call(self, path, function):
+        """
+        Encola una función que escribe en path y se corre en el hilo
+
+        Args:
+            path: Archivo en el que escribe la función (agrupa y ordena)
+            function: Función sin argumentos; su resultado se descarta
+        """
+        with self.condition:
+            entry = self._get_entry(path, 'call')
+            if entry is None:
+                self.pending[path] = ['call', [function], time.perf_counter()]
+            else:
+                entry[1].append(function)
+            self._count_submitted()
+
+
+    def _get_entry(self, path, kind):
+        """Escritura pendiente de un archivo (None si no hay); no se mezclan tipos"""
+        if self.closed:
+            raise RuntimeError("La cola de escritura ya está cerrada")
+
+        entry = self.pending.get(path)
+        if entry is not None and entry[0] != kind:
+            raise ValueError(f"{path} ya tiene una escritura '{entry[0]}' pendiente")
+        return entry
+
+
+    def _count_submitted(self):
+        """Cuenta una escritura nueva en la cola y despierta al hilo"""
+        self.submitted += 1
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        self.condition.notify_all()
+
+    # ========================================
+    # CONSULTAS Y CIERRE
+    # ========================================
+
+    def is_pending(self, path):
+        """Indica si un archivo tiene escrituras encoladas o en curso"""
+        with self.condition:
+            return path in self.pending or path in self.busy
+
+
+    def flush(self):
+        """Escribe ya lo pendiente y espera a que termine"""
+        with self.condition:
+            self.flushing += 1
+            self.condition.notify_all()
+            try:
+                self.condition.wait_for(lambda: not self.pending and not self.busy)
+            finally:
+                self.flushing -= 1
+
+
+    def close(self):
+        """Escribe lo pendiente y detiene el hilo (al salir del juego)"""
+        if self.closed:
+            return
+
+        self.flush()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    # ========================================
+    # HILO DE ESCRITURA
+    # ========================================
+
+    def _run(self):
+        """Espera escrituras y las hace en lotes hasta que se cierra la cola"""
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.closed)
+                if self.closed and not self.pending:
+                    return
+
+                # Juntar lo que llegue durante batch_delay, salvo que se pida flush
+                self.condition.wait_for(lambda: self.flushing or self.closed,
+                                        timeout=self.batch_delay)
+
+                batch = self.pending
+                self.pending = OrderedDict()
+                self.busy = set(batch)
+
+            started = time.perf_counter()
+            for path, (kind, data, queued) in batch.items():
+                self._write(path, kind, data)
+                self.latencies.append(time.perf_counter() - queued)
+            self.write_times.append(time.perf_counter() - started)
+
+            with self.condition:
+                self.depth -= sum(len(data) if kind != 'replace' else 1
+                                  for kind, data, _ in batch.values())
+                self.batches += 1
+                self.busy = set()
+                self.condition.notify_all()
+
+
+    def _write(self, path, kind, data):
+        """Hace una escritura del lote; un error se informa pero no detiene el hilo"""
+        try:
+            if kind == 'append':
+                chunk = b''.join(part.encode('utf-8') if isinstance(part, str) else part
+                                 for part in data)
+                with open(path, 'ab') as f:
+                    f.write(chunk)
+            elif kind == 'call':
+                for function in data:
+                    function()
+            else:
+                if callable(data):
+                    data = data()
+                if isinstance(data, str):
+                    data = data.encode('utf-8')
+
+                temp_path = path + '.tmp'
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+        except Exception as error:
+            self.errors += 1
+            print(f"⚠️ No se pudo escribir {path}: {error}")
+            return
+
+        self.writes += 1
+
+    # ========================================
+    # MÉTRICAS
+    # ========================================
+
+    def get_stats(self):
+        """Obtiene la profundidad de la cola y las latencias de escritura (ms)"""
+        with self.condition:
+            latencies = sorted(self.latencies)
+            write_times = sorted(self.write_times)
+            stats = {
+                'depth': self.depth,
+                'max_depth': self.max_depth,
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'batches': self.batches,
+                'writes': self.writes,
+                'errors': self.errors
+            }
+
+        # Latencia: de encolar a escrito; lote: tiempo del hilo escribiendo
+        for name, values in (('latency', latencies), ('batch', write_times)):
+            last = len(values) - 1
+            stats[f'{name}_p50_ms'] = values[last // 2] * 1000 if values else 0.0
+            stats[f'{name}_max_ms'] = values[last] * 1000 if values else 0.0
+        return stats
+
+
+    def print_report(self):
+        """Imprime las métricas de la cola"""
+        stats = self.get_stats()
+        print(f"💾 Escrituras en segundo plano: {stats['writes']} escrituras en "
+              f"{stats['batches']} lotes ({stats['coalesced']} reemplazos combinados, "
+              f"{stats['errors']} errores)")
+        print(f"   - Cola: máximo {stats['max_depth']} pendientes")
+        print(f"   - Latencia: p50 {stats['latency_p50_ms']:.1f} ms, "
+              f"máx {stats['latency_max_ms']:.1f} ms "
+              f"(lote p50 {stats['batch_p50_ms']:.1f} ms)")
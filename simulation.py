@@ -0,0 +1,591 @@
+"""
+🏁 NÚCLEO DE SIMULACIÓN - Juego de Carreras Retro
+Reglas de la carrera sin dependencias de Pygame.
+
+Permite avanzar una carrera tan rápido como lo permita la CPU, sin ventana
+ni reloj, para balanceo, pruebas de regresión y bots.
+
+Uso básico:
+    race = Race()
+    while race.step(['left']):
+        pass
+"""
+
+# ============================================
+# IMPORTACIONES
+# ============================================
+import random
+from array import array
+from collections import deque
+
+
+# ============================================
+# REGLAS DE LA CARRERA
+# ============================================
+
+# Configuración del canvas del juego
+CANVAS_WIDTH = 400
+CANVAS_HEIGHT = 600
+
+# Configuración del jugador
+PLAYER_WIDTH = 40
+PLAYER_HEIGHT = 60
+
+# Configuración de enemigos
+ENEMY_WIDTH = 40
+ENEMY_HEIGHT = 60
+
+# Configuración de la carretera
+ROAD_WIDTH = 80
+LANES = 3
+
+# Configuración de juego
+BASE_SPEED = 3
+SPEED_INCREMENT = 0.5
+POINTS_PER_CAR = 1
+SPEED_UP_EVERY = 10
+
+# Frames de simulación por segundo de juego (las velocidades son por frame)
+TICK_RATE = 60
+
+
+# ============================================
+# NIVELES DE DIFICULTAD
+# ============================================
+LEVELS = [
+    {
+        'name': 'FÁCIL',
+        'enemy_frequency': 100,
+        'max_enemies': 3,
+        'min_score': 0
+    },
+    {
+        'name': 'MEDIO',
+        'enemy_frequency': 70,
+        'max_enemies': 4,
+        'min_score': 50
+    },
+    {
+        'name': 'DIFÍCIL',
+        'enemy_frequency': 50,
+        'max_enemies': 5,
+        'min_score': 100
+    }
+]
+
+
+# ============================================
+# ALMACÉN DE ENEMIGOS
+# ============================================
+
+class Enemy:
+    """
+    Enemigo reutilizable que apunta a un slot de un EnemyStore.
+
+    Hay uno por slot y se recicla cada vez que el slot recibe un enemigo
+    nuevo, así que generar enemigos no crea objetos.
+    """
+
+    __slots__ = ('store', 'slot')
+
+    def __init__(self, store, slot):
+        self.store = store
+        self.slot = slot
+
+    @property
+    def id(self):
+        return self.store.id[self.slot]
+
+    @property
+    def x(self):
+        return self.store.x[self.slot]
+
+    @property
+    def y(self):
+        return self.store.y[self.slot] + self.store.scroll
+
+    @property
+    def lane(self):
+        return self.store.lane[self.slot]
+
+    @property
+    def passed(self):
+        return bool(self.store.passed[self.slot])
+
+
+class EnemyStore:
+    """
+    Enemigos guardados en columnas (struct-of-arrays) preasignadas.
+
+    Todos los enemigos aparecen a la misma altura y bajan a la misma
+    velocidad, así que el orden de aparición es también el orden en Y:
+    los slots forman una cola circular donde el más antiguo (el más abajo)
+    está en `head`. Los adelantados son un prefijo de la cola y los que
+    salen de pantalla siempre se quitan por el frente, sin desplazar nada.
+
+    Como bajan todos juntos, la columna y guarda la altura relativa a
+    `scroll`: mover a todos los enemigos es una sola suma.
+
+    Cada carril tiene además su propia cola de slots ordenada en Y, así
+    la colisión solo mira el primer enemigo no adelantado del carril del
+    jugador y el costo por frame no crece con la cantidad de enemigos.
+
+    Iterar el almacén entrega objetos Enemy de un pool por slot; los
+    contadores pool_hits y pool_misses muestran si se crearon objetos.
+    """
+
+    def __init__(self, capacity, lanes=LANES):
+        """
+        Inicializa el almacén
+
+        Args:
+            capacity: Cantidad de slots preasignados
+            lanes: Cantidad de carriles
+        """
+        self.capacity = capacity
+        self.x = array('d', [0.0]) * capacity
+        self.y = array('d', [0.0]) * capacity
+        self.lane = array('b', [0]) * capacity
+        self.passed = array('b', [0]) * capacity
+        self.id = array('q', [0]) * capacity
+
+        self.next_id = 0       # Siguiente id entero a asignar
+        self.head = 0          # Slot del enemigo más antiguo
+        self.count = 0         # Enemigos vivos
+        self.passed_count = 0  # Enemigos ya adelantados (prefijo de la cola)
+        self.scroll = 0.0      # Distancia bajada por todos los enemigos
+
+        # Colas por carril: slots del más abajo al más arriba
+        self.lane_queues = [deque() for _ in range(lanes)]
+        self.lane_passed = [0] * lanes  # Adelantados al frente de cada carril
+
+        # Pool de objetos Enemy, uno por slot (se crean la primera vez)
+        self.entities = [None] * capacity
+        self.pool_hits = 0    # Apariciones que reciclaron un Enemy
+        self.pool_misses = 0  # Apariciones que tuvieron que crear uno
+
+
+    def __len__(self):
+        return self.count
+
+
+    def __iter__(self):
+        """Itera los enemigos vivos (objetos del pool) del más abajo al más arriba"""
+        entities = self.entities
+        for slot in self.slots():
+            yield entities[slot]
+
+
+    def spawn(self, x, y, lane):
+        """Agrega un enemigo al final de la cola y retorna su objeto Enemy"""
+        if self.count == self.capacity:
+            self._grow()
+
+        slot = (self.head + self.count) % self.capacity
+        self.x[slot] = x
+        self.y[slot] = y - self.scroll
+        self.lane[slot] = lane
+        self.passed[slot] = 0
+        self.id[slot] = self.next_id
+        self.next_id += 1
+        self.count += 1
+        self.lane_queues[lane].append(slot)
+
+        entity = self.entities[slot]
+        if entity is None:
+            entity = self.entities[slot] = Enemy(self, slot)
+            self.pool_misses += 1
+        else:
+            self.pool_hits += 1
+        return entity
+
+
+    def _grow(self):
+        """Duplica la capacidad conservando el orden de la cola"""
+        slots = list(self.slots())
+        capacity = self.capacity * 2 or 1
+        free = capacity - self.count
+
+        self.x = array('d', [self.x[i] for i in slots]) + array('d', [0.0]) * free
+        self.y = array('d', [self.y[i] for i in slots]) + array('d', [0.0]) * free
+        self.lane = array('b', [self.lane[i] for i in slots]) + array('b', [0]) * free
+        self.passed = array('b', [self.passed[i] for i in slots]) + array('b', [0]) * free
+        self.id = array('q', [self.id[i] for i in slots]) + array('q', [0]) * free
+        self.capacity = capacity
+        self.head = 0
+
+        # Los slots cambiaron de número: renumerar las colas por carril
+        new_slot = {old: new for new, old in enumerate(slots)}
+        self.lane_queues = [deque(new_slot[old] for old in queue)
+                            for queue in self.lane_queues]
+
+        # Conservar los objetos Enemy ya creados con su nuevo slot
+        entities = [None] * capacity
+        for old, entity in enumerate(self.entities):
+            if entity is None:
+                continue
+            new = new_slot.get(old)
+            if new is None:
+                continue  # Slot libre: su objeto se descarta
+            entity.slot = new
+            entities[new] = entity
+        self.entities = entities
+
+
+    def slots(self, start=0):
+        """Itera los slots vivos en orden de la cola, desde la posición start"""
+        capacity = self.capacity
+        for i in range(start, self.count):
+            yield (self.head + i) % capacity
+
+
+    def advance(self, dy):
+        """Mueve todos los enemigos dy píxeles hacia abajo"""
+        self.scroll += dy
+
+
+    def mark_passed(self, limit_y):
+        """
+        Marca como adelantados los enemigos que bajaron de limit_y
+
+        Returns:
+            Cantidad de enemigos adelantados en esta llamada
+        """
+        newly_passed = 0
+        capacity = self.capacity
+        limit = limit_y - self.scroll
+
+        while self.passed_count < self.count:
+            slot = (self.head + self.passed_count) % capacity
+            if self.y[slot] <= limit:
+                break
+            self.passed[slot] = 1
+            self.passed_count += 1
+            self.lane_passed[self.lane[slot]] += 1
+            newly_passed += 1
+
+        return newly_passed
+
+
+    def overlaps(self, x, y, width, height, lane):
+        """
+        Verifica si algún enemigo no adelantado del carril toca el rectángulo
+
+        Los carriles son más anchos que los autos, así que solo pueden
+        chocar el jugador y los enemigos de su mismo carril.
+        """
+        queue = self.lane_queues[lane]
+        ex = self.x
+        ey = self.y
+        scroll = self.scroll
+
+        for i in range(self.lane_passed[lane], len(queue)):
+            slot = queue[i]
+            enemy_y = ey[slot] + scroll
+            if enemy_y + ENEMY_HEIGHT <= y:
+                break  # Este enemigo y los que siguen están más arriba
+
+            if (x < ex[slot] + ENEMY_WIDTH and
+                x + width > ex[slot] and
+                y < enemy_y + ENEMY_HEIGHT and
+                y + height > enemy_y):
+                return True
+        return False
+
+
+    def get_pool_stats(self):
+        """Obtiene los contadores del pool de objetos Enemy"""
+        return {
+            'hits': self.pool_hits,
+            'misses': self.pool_misses,
+            'size': sum(entity is not None for entity in self.entities)
+        }
+
+
+    def lane_front_y(self, lane):
+        """Obtiene la Y del primer enemigo no adelantado del carril, o None"""
+        queue = self.lane_queues[lane]
+        passed = self.lane_passed[lane]
+        if passed < len(queue):
+            return self.y[queue[passed]] + self.scroll
+        return None
+
+
+    def cull(self, limit_y):
+        """Quita del frente de la cola los enemigos que bajaron de limit_y"""
+        limit = limit_y - self.scroll
+
+        while self.count and self.y[self.head] > limit:
+            lane = self.lane[self.head]
+            self.lane_queues[lane].popleft()
+            if self.passed[self.head]:
+                self.passed_count -= 1
+                self.lane_passed[lane] -= 1
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+
+
+# ============================================
+# CLASE RACE
+# ============================================
+
+class Race:
+    """
+    Estado y reglas de una carrera individual.
+    No dibuja nada: el renderizado vive en la clase Player del juego.
+    """
+
+    def __init__(self, seed=None, levels=LEVELS):
+        """
+        Inicializa una carrera nueva
+
+        Args:
+            seed: Semilla del tráfico; la misma semilla genera el mismo
+                  tráfico (None = no reproducible)
+            levels: Tabla de niveles con el formato de LEVELS
+        """
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.levels = levels
+
+        # Posición inicial del jugador
+        self._init_position()
+
+        # Estadísticas del jugador
+        self._init_stats()
+
+        # Enemigos y gestión del juego
+        self._init_game_state()
+
+
+    def _init_position(self):
+        """Inicializa la posición del jugador"""
+        self.x = CANVAS_WIDTH // 2 - PLAYER_WIDTH // 2
+        self.y = CANVAS_HEIGHT - PLAYER_HEIGHT - 20
+
+
+    def _init_stats(self):
+        """Inicializa las estadísticas del jugador"""
+        self.score = 0
+        self.level = 0
+        self.speed = BASE_SPEED
+        self.speed_multiplier = 1.0
+        self.alive = True
+
+
+    def _init_game_state(self):
+        """Inicializa el estado del juego para esta carrera"""
+        capacity = max(level['max_enemies'] for level in self.levels)
+        self.enemies = EnemyStore(capacity)
+        self.road_offset = 0
+        self.frame_distance = 0  # Píxeles avanzados en el último frame
+        self.frame_count = 0
+
+    # ========================================
+    # MÉTODOS DE CÁLCULO DE POSICIÓN
+    # ========================================
+
+    def get_lane_x(self, lane):
+        """Obtiene la posición X de un carril específico"""
+        lane_width = CANVAS_WIDTH // LANES
+        return lane * lane_width + (lane_width - PLAYER_WIDTH) // 2
+
+
+    def get_current_lane(self):
+        """Obtiene el carril actual del jugador"""
+        lane_width = CANVAS_WIDTH // LANES
+        return int(self.x // lane_width)
+
+
+    # ========================================
+    # MÉTODOS DE MOVIMIENTO
+    # ========================================
+
+    def move_left(self):
+        """Mueve el jugador al carril izquierdo"""
+        current_lane = self.get_current_lane()
+        if current_lane > 0:
+            self.x = self.get_lane_x(current_lane - 1)
+
+
+    def move_right(self):
+        """Mueve el jugador al carril derecho"""
+        current_lane = self.get_current_lane()
+        if current_lane < LANES - 1:
+            self.x = self.get_lane_x(current_lane + 1)
+
+
+    def apply_action(self, action):
+        """Aplica una acción ('left' o 'right') al jugador"""
+        if action == 'left':
+            self.move_left()
+        elif action == 'right':
+            self.move_right()
+
+
+    # ========================================
+    # MÉTODOS DE GESTIÓN DE ENEMIGOS
+    # ========================================
+
+    def spawn_enemy(self):
+        """Genera un enemigo nuevo según la frecuencia del nivel actual"""
+        current_level = self.levels[self.level]
+
+        if (self.frame_count % current_level['enemy_frequency'] == 0 and
+            len(self.enemies) < current_level['max_enemies']):
+
+            lane = self.rng.randint(0, LANES - 1)
+            self.enemies.spawn(self.get_lane_x(lane), -ENEMY_HEIGHT, lane)
+
+    def update_enemies(self):
+        """Actualiza la posición de los enemigos y verifica colisiones"""
+        enemies = self.enemies
+        enemies.advance(self.speed)
+
+        # Verificar si el jugador adelantó enemigos
+        for _ in range(enemies.mark_passed(self.y + PLAYER_HEIGHT)):
+            self._handle_enemy_passed()
+
+        # Verificar colisión
+        if self.check_collision():
+            self.alive = False
+            return True  # Retorna True si hay colisión
+
+        # Eliminar enemigos fuera de pantalla
+        enemies.cull(CANVAS_HEIGHT)
+
+        return False
+
+
+    def _handle_enemy_passed(self):
+        """Maneja cuando un enemigo es adelantado"""
+        self.add_score(POINTS_PER_CAR)
+
+
+    def check_collision(self):
+        """Verifica si hay colisión entre el jugador y algún enemigo"""
+        return self.enemies.overlaps(self.x, self.y, PLAYER_WIDTH, PLAYER_HEIGHT,
+                                     self.get_current_lane())
+
+
+    # ========================================
+    # MÉTODOS DE PUNTUACIÓN Y NIVELES
+    # ========================================
+
+    def add_score(self, points):
+        """Añade puntos y actualiza la velocidad y nivel"""
+        self.score += points
+        self._update_speed()
+        self._update_level()
+
+
+    def _update_speed(self):
+        """Actualiza la velocidad según la puntuación"""
+        new_speed_multiplier = 1 + (self.score // SPEED_UP_EVERY) * SPEED_INCREMENT
+
+        if new_speed_multiplier > self.speed_multiplier:
+            self.speed_multiplier = new_speed_multiplier
+            self.speed = BASE_SPEED * self.speed_multiplier
+
+
+    def _update_level(self):
+        """Actualiza el nivel según la puntuación"""
+        while (self.level + 1 < len(self.levels) and
+               self.score >= self.levels[self.level + 1]['min_score']):
+            self.level += 1
+
+
+    # ========================================
+    # MÉTODOS DE ACTUALIZACIÓN PRINCIPAL
+    # ========================================
+
+    def update(self):
+        """Avanza la carrera un frame"""
+        if not self.alive:
+            return False
+
+        self.frame_count += 1
+        self.frame_distance = self.speed
+        self.road_offset += self.frame_distance
+        self.spawn_enemy()
+        collision = self.update_enemies()
+
+        return not collision  # Retorna True si no hay colisión
+
+
+    def skip_frames(self, frames):
+        """
+        Avanza varios frames de una vez sin revisar enemigos
+
+        Solo es válido si en esos frames no hay apariciones, adelantamientos,
+        colisiones ni salidas de pantalla (ver event_simulation).
+        """
+        if frames <= 0:
+            return
+
+        distance = self.speed * frames
+        self.frame_count += frames
+        self.frame_distance = self.speed
+        self.road_offset += distance
+        self.enemies.advance(distance)
+
+
+    def step(self, actions=()):
+        """
+        Aplica las acciones del frame y avanza la carrera un frame
+
+        Args:
+            actions: Secuencia de acciones ('left' o 'right') a aplicar
+                     antes de avanzar
+
+        Returns:
+            True si el jugador sigue vivo después del frame
+        """
+        if not self.alive:
+            return False
+
+        for action in actions:
+            self.apply_action(action)
+
+        return self.update()
+
+
+    def get_result(self):
+        """Obtiene el resumen de la carrera"""
+        return {
+            'score': self.score,
+            'frames': self.frame_count,
+            'level': self.level,
+            'alive': self.alive
+        }
+
+
+# ============================================
+# EJECUCIÓN SIN VENTANA
+# ============================================
+
+def run_race(policy=None, max_frames=None, race=None, seed=None, levels=LEVELS):
+    """
+    Corre una carrera completa sin renderizar y sin limitar los FPS
+
+    Args:
+        policy: Función policy(race) que retorna las acciones del frame.
+                Si es None, el jugador no se mueve.
+        max_frames: Límite de frames a simular (None = hasta chocar)
+        race: Carrera a continuar (por defecto una nueva)
+        seed: Semilla de la carrera nueva (se ignora si se pasa race)
+        levels: Tabla de niveles de la carrera nueva
+
+    Returns:
+        Diccionario con el resultado de la carrera
+    """
+    if race is None:
+        race = Race(seed, levels)
+
+    while race.alive:
+        if max_frames is not None and race.frame_count >= max_frames:
+            break
+        actions = policy(race) if policy else ()
+        race.step(actions)
+
+    return race.get_result()